@@ -1,19 +1,43 @@
 import os
+import time
 import pygame
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from voices import DEFAULT_CHOKE_GROUPS, VoicePool, choke_map_from_groups
 
 class AudioManager:
     """Handles loading and playback of all audio, including BGM and sound effects."""
 
+    # Mixer output buffer (frames per device callback)
+    MIXER_BUFFER_FRAMES = 1024
+
     # --- Sound Mechanics Configuration ---
     POLYPHONY_LIMIT = 4
-    CHOKE_MAP = {
-        "11": ["18"],  # Closed HH chokes Open HH
-        "1B": ["18"],  # Pedal HH chokes Open HH
-    }
+    MIXER_CHANNELS = 64
+    # Channel 0 is left for the MixerStream; the rest form the voice pool.
+    VOICE_POOL_FIRST_CHANNEL = 1
+
+    # --- Sample Loading Configuration ---
+    # Samples first used within this many ms after the BGM start must be
+    # decoded before playback begins; the rest keep loading in the background.
+    PRELOAD_AHEAD_MS = 5000
+    LOADER_WORKERS = min(8, os.cpu_count() or 1)
 
-    def __init__(self, dtx_data):
+    def __init__(self, dtx_data, pcm_cache=None, sample_pool=None, choke_groups=None):
+        """
+        Args:
+            dtx_data (Dtx): The parsed chart.
+            pcm_cache (PcmCache): Decoded-sample cache, or None to always decode.
+            sample_pool (SamplePool): Shared in-memory samples, or None to keep
+                this chart's samples private.
+            choke_groups (dict): Choke configuration; defaults to
+                voices.DEFAULT_CHOKE_GROUPS.
+        """
         self.dtx = dtx_data
+        self.pcm_cache = pcm_cache
+        self.sample_pool = sample_pool
+        self._pool_keys = []  # One entry per sample_pool reference held
         self.sounds = {}
         self.bgm_path = None
         self.bgm_volume = 0.7
@@ -24,38 +48,121 @@ class AudioManager:
         self.se_fade_out_ms = 100
         self.bgm_fade_ms = 400
 
-        # --- Audio State Management ---
-        self.active_poly_sounds = {}
-        self.active_choke_sounds = {}
-        self.CHOKEABLE_CHANNELS = list(
-            set(
-                choked
-                for choker, choked_list in self.CHOKE_MAP.items()
-                for choked in choked_list
-            )
-        )
+        # --- Choke Configuration ---
+        self.choke_groups = DEFAULT_CHOKE_GROUPS if choke_groups is None else choke_groups
+        self.choke_map = choke_map_from_groups(self.choke_groups)
+
+        # --- Background Loading State ---
+        self._loader = None
+        self._load_lock = threading.Lock()
+        self._load_start = 0.0
+        self.load_progress = (0, 0)  # (samples finished, samples queued)
+
+        # Manual hits are played from the MIDI input thread
+        self._play_lock = threading.Lock()
 
         print("\nInitializing Pygame audio...")
-        pygame.mixer.pre_init(44100, -16, 2, 1024)
+        pygame.mixer.pre_init(44100, -16, 2, self.MIXER_BUFFER_FRAMES)
         pygame.init()
-        pygame.mixer.set_num_channels(64)
+        pygame.mixer.set_num_channels(self.MIXER_CHANNELS)
+        self.voices = VoicePool(
+            self.VOICE_POOL_FIRST_CHANNEL,
+            self.MIXER_CHANNELS - self.VOICE_POOL_FIRST_CHANNEL,
+            self.POLYPHONY_LIMIT,
+            self.choke_groups,
+            fade_out_ms=self.se_fade_out_ms,
+        )
         print("Pygame audio initialized.")
 
-    def load_sounds(self):
-        """Loads all audio files defined in the DTX data into memory."""
+    def _wav_load_order(self):
+        """
+        Returns (wav_id, path, first_use_ms) for every sound effect, ordered by
+        the time the WAV is first played. WAVs no chip uses come last.
+        """
+        first_use = {}
+        for time_ms, _, wav_id in self.dtx.timed_notes:
+            if wav_id not in first_use:
+                first_use[wav_id] = time_ms
+        order = [
+            (wav_id, self.dtx.wav_files[wav_id], time_ms)
+            for wav_id, time_ms in first_use.items()
+            if wav_id in self.dtx.wav_files
+        ]
+        order.extend(
+            (wav_id, path, float("inf"))
+            for wav_id, path in self.dtx.wav_files.items()
+            if wav_id not in first_use
+        )
+        return order
+
+    def _decode(self, path, key=None):
+        if self.pcm_cache:
+            return self.pcm_cache.load(path, key)
+        return pygame.mixer.Sound(path)
+
+    def _load_sound(self, wav_id, path):
+        """Decodes (or fetches from the sample pool) one sample on a loader thread."""
+        try:
+            if self.sample_pool is not None:
+                key, self.sounds[wav_id] = self.sample_pool.acquire(path, self._decode)
+                self._pool_keys.append(key)
+            else:
+                self.sounds[wav_id] = self._decode(path)
+        except (pygame.error, OSError) as e:
+            logging.warning(f"Could not load '{os.path.basename(path)}'. Error: {e}")
+        finally:
+            with self._load_lock:
+                done, total = self.load_progress
+                self.load_progress = (done + 1, total)
+            if done + 1 == total:
+                elapsed_ms = (time.perf_counter() - self._load_start) * 1000
+                logging.info(f"All {len(self.sounds)} sound effects loaded in {elapsed_ms:.0f}ms.")
+                if self.pcm_cache:
+                    logging.info(self.pcm_cache.summary())
+                if self.sample_pool is not None:
+                    logging.info(self.sample_pool.summary())
+
+    @property
+    def is_loading(self):
+        done, total = self.load_progress
+        return done < total
+
+    def load_sounds(self, ahead_ms=None):
+        """
+        Loads all audio files defined in the DTX data into memory.
+
+        Sound effects are decoded on a thread pool (pygame releases the GIL
+        while decoding) in order of first use. This returns as soon as every
+        sample needed in the first `ahead_ms` after the BGM start is ready;
+        later samples keep loading in the background (see load_progress).
+
+        Args:
+            ahead_ms (float): Defaults to PRELOAD_AHEAD_MS. Pass float("inf")
+                to wait for every sample.
+        """
         logging.info("--- Loading Audio Files ---")
-        for wav_id, path in self.dtx.wav_files.items():
+        self._load_start = time.perf_counter()
+        if ahead_ms is None:
+            ahead_ms = self.PRELOAD_AHEAD_MS
+        ready_by_ms = self.dtx.bgm_start_time_ms + ahead_ms
+
+        jobs = []
+        for wav_id, path, first_use_ms in self._wav_load_order():
             if not os.path.exists(path):
                 logging.warning(f"Audio file not found for WAV ID {wav_id}: {path}")
                 continue
             if wav_id == self.dtx.bgm_wav_id:
                 self.bgm_path = path
                 continue
-            try:
-                sound = pygame.mixer.Sound(path)
-                self.sounds[wav_id] = sound
-            except pygame.error as e:
-                logging.warning(f"Could not load '{os.path.basename(path)}'. Error: {e}")
+            jobs.append((wav_id, path, first_use_ms))
+
+        self.load_progress = (0, len(jobs))
+        self._loader = ThreadPoolExecutor(max_workers=self.LOADER_WORKERS, thread_name_prefix="sample-loader")
+        needed = []
+        for wav_id, path, first_use_ms in jobs:
+            future = self._loader.submit(self._load_sound, wav_id, path)
+            if first_use_ms <= ready_by_ms:
+                needed.append(future)
 
         if self.bgm_path:
             try:
@@ -65,7 +172,36 @@ class AudioManager:
             except pygame.error as e:
                 logging.warning(f"Could not load BGM '{os.path.basename(self.bgm_path)}'. Error: {e}")
                 self.bgm_path = None
-        logging.info(f"{len(self.sounds)} sound effects loaded.")
+
+        pending = needed
+        while pending:
+            _, pending = wait(pending, timeout=0.25)
+            done, total = self.load_progress
+            logging.info(f"Loading samples: {done}/{total}")
+
+        elapsed_ms = (time.perf_counter() - self._load_start) * 1000
+        if ahead_ms == float("inf"):
+            logging.info(f"Ready to play after {elapsed_ms:.0f}ms: all {len(needed)} samples loaded.")
+        else:
+            logging.info(
+                f"Ready to play after {elapsed_ms:.0f}ms: {len(needed)} samples for the first "
+                f"{ahead_ms / 1000:g}s loaded, {self.load_progress[1] - self.load_progress[0]} still loading."
+            )
+
+    def close(self):
+        """
+        Cancels background loading, waits for in-flight decodes to finish and
+        returns this chart's samples to the sample pool.
+        """
+        if self._loader:
+            self._loader.shutdown(wait=True, cancel_futures=True)
+            self._loader = None
+        pygame.mixer.stop()
+        self.sounds.clear()
+        if self.sample_pool is not None:
+            for key in self._pool_keys:
+                self.sample_pool.release(key)
+            self._pool_keys.clear()
 
     def play_bgm(self, start_pos_s=0):
         if self.bgm_path:
@@ -76,6 +212,16 @@ class AudioManager:
                 logging.error(f"Could not play BGM. Error: {e}")
         return False
 
+    def restart_bgm(self, start_pos_s=0):
+        """Restarts the BGM at a position at once, without fades (for seeking)."""
+        if self.bgm_path:
+            try:
+                pygame.mixer.music.play(start=start_pos_s)
+                return True
+            except pygame.error as e:
+                logging.error(f"Could not play BGM. Error: {e}")
+        return False
+
     def stop_bgm(self):
         if self.bgm_path:
             pygame.mixer.music.fadeout(self.bgm_fade_ms)
@@ -89,49 +235,22 @@ class AudioManager:
         self.se_volume = volume
 
     def play_note(self, channel_id, wav_id, current_time_ms):
-        """Plays a note with choke and polyphony logic."""
-        if wav_id not in self.sounds:
+        """
+        Plays a note on the voice pool, which applies choke, polyphony and
+        priority. Safe to call from the MIDI input thread.
+        """
+        sound = self.sounds.get(wav_id)
+        if sound is None:
             return
 
-        sound_to_play = self.sounds[wav_id]
-
-        # 1. --- Choke Logic ---
-        if channel_id in self.CHOKE_MAP:
-            for choked_channel_id in self.CHOKE_MAP[channel_id]:
-                if choked_channel_id in self.active_choke_sounds:
-                    channel_to_stop = self.active_choke_sounds.pop(choked_channel_id)
-                    if channel_to_stop and channel_to_stop.get_busy():
-                        logging.debug(f"Choke: Note {channel_id} stopping active sound on channel {choked_channel_id}")
-                        channel_to_stop.fadeout(self.se_fade_out_ms)
-
-        # 2. --- Polyphony & Playback Logic ---
-        if channel_id not in self.active_poly_sounds:
-            self.active_poly_sounds[channel_id] = []
-
-        playing_instances = self.active_poly_sounds[channel_id]
-        playing_instances = [item for item in playing_instances if item[0].get_busy()]
-
-        if len(playing_instances) >= self.POLYPHONY_LIMIT:
-            playing_instances.sort(key=lambda x: x[1])
-            oldest_channel, oldest_time = playing_instances.pop(0)
-            logging.debug(f"Polyphony: Chan {channel_id} limit reached. Stealing voice from note played at {oldest_time:.2f}ms.")
-            oldest_channel.fadeout(self.se_fade_out_ms)
-
         wav_vol_percent = self.dtx.wav_volumes.get(wav_id, 100)
         final_volume = self.se_volume * (wav_vol_percent / 100.0)
-        sound_to_play.set_volume(final_volume)
-        new_channel = sound_to_play.play(fade_ms=self.se_fade_in_ms)
-
-        if new_channel:
-            playing_instances.append((new_channel, current_time_ms))
-            if channel_id in self.CHOKEABLE_CHANNELS:
-                self.active_choke_sounds[channel_id] = new_channel
-
-        self.active_poly_sounds[channel_id] = playing_instances
+        with self._play_lock:
+            self.voices.play(channel_id, sound, final_volume, fade_in_ms=self.se_fade_in_ms)
 
     def stop_all_sounds(self):
         """Stops all currently playing sound effects immediately."""
         pygame.mixer.stop()
-        self.active_poly_sounds.clear()
-        self.active_choke_sounds.clear()
+        with self._play_lock:
+            self.voices.stop_all()
         logging.info("All active sounds stopped for seek.")
@@ -0,0 +1,257 @@
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import platform
+import tempfile
+import tracemalloc
+from dtx import Dtx
+from gen_chart import generate_chart
+
+# Stored results that later runs are compared against. Timings only mean
+# something on the machine that recorded them, so baselines live in the
+# user's cache rather than the repository; override with DTX_BENCH_BASELINES.
+DEFAULT_BASELINE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "dtx_player", "bench_baselines.json")
+
+# Iterations of the calibration loop (see calibrate).
+CALIBRATION_LINES = 20000
+
+# A case is slower than its baseline if its best time grows by more than this.
+DEFAULT_TOLERANCE = 0.25
+
+EXAMPLES_GLOB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "examples", "**", "*.dtx")
+
+# Synthetic cases: name -> generate_chart() arguments.
+SYNTHETIC_CASES = {
+    "typical": dict(measures=120, density=16, subdivision=48),
+    "dense_192nd": dict(measures=200, density=96, subdivision=192),
+    "max_measures": dict(measures=999, density=16, subdivision=64),
+    "tempo_churn": dict(measures=200, density=16, subdivision=192, bpm_changes=600),
+    "odd_bars": dict(measures=300, density=16, subdivision=96, odd_bars=0.5),
+    "utf16": dict(measures=200, density=32, subdivision=96, encoding="utf-16-le"),
+}
+
+
+def calibrate(repeat=5):
+    """
+    Times a fixed pure-Python workload resembling line parsing (split, dict
+    and float work), best of repeat, in ms.
+
+    Results are compared as multiples of this figure, so a machine that is
+    uniformly faster or slower, or busier than when the baseline was saved,
+    does not show up as a parser regression.
+    """
+    lines = [f"#{i % 1296:03X}{i % 36:02X}: {i * 7 % 100000:08d}" for i in range(CALIBRATION_LINES)]
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        table = {}
+        for line in lines:
+            key, _, value = line[1:].partition(":")
+            table[key[:3]] = float(value.strip()) + table.get(key[:3], 0.0)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_file(path, repeat=5, columnar=False, mode="full"):
+    """
+    Times Dtx.parse on one chart.
+
+    The best of `repeat` runs is reported, so background noise only ever makes
+    numbers look slower. Peak memory is measured in a separate run because
+    tracemalloc slows the parser down.
+
+    Returns:
+        dict: "best_ms", "lines_per_s", "chips_per_s", "peak_kib", "lines", "chips".
+    """
+    times = []
+    dtx = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        dtx = Dtx(path)
+        dtx.parse(columnar=columnar, mode=mode)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    Dtx(path).parse(columnar=columnar, mode=mode)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    lines = len(dtx._read_text()[0].splitlines())
+    chips = len(dtx.timed_notes) + len(dtx.bpm_events)
+    best = min(times)
+    return {
+        "best_ms": best * 1000,
+        "lines_per_s": lines / best if best > 0 else 0.0,
+        "chips_per_s": chips / best if best > 0 else 0.0,
+        "peak_kib": peak / 1024,
+        "lines": lines,
+        "chips": chips,
+    }
+
+
+def run_suite(repeat=5, columnar=False, mode="full", cases=None):
+    """
+    Benchmarks the example charts (as one combined case) and every synthetic case.
+
+    Args:
+        cases (iterable): Case names to run; all of them if None.
+
+    Returns:
+        dict: Case name -> bench_file() result.
+    """
+    results = {}
+    wanted = set(cases) if cases else None
+
+    examples = sorted(glob.glob(EXAMPLES_GLOB, recursive=True))
+    if examples and (wanted is None or "examples" in wanted):
+        per_file = [bench_file(path, repeat, columnar, mode) for path in examples]
+        best = sum(r["best_ms"] for r in per_file) / 1000
+        lines = sum(r["lines"] for r in per_file)
+        chips = sum(r["chips"] for r in per_file)
+        results["examples"] = {
+            "best_ms": best * 1000,
+            "lines_per_s": lines / best if best > 0 else 0.0,
+            "chips_per_s": chips / best if best > 0 else 0.0,
+            "peak_kib": max(r["peak_kib"] for r in per_file),
+            "lines": lines,
+            "chips": chips,
+        }
+
+    with tempfile.TemporaryDirectory(prefix="dtx_bench_") as tmp:
+        for name, params in SYNTHETIC_CASES.items():
+            if wanted is not None and name not in wanted:
+                continue
+            path = os.path.join(tmp, f"{name}.dtx")
+            generate_chart(path, **params)
+            results[name] = bench_file(path, repeat, columnar, mode)
+    return results
+
+
+def _baseline_key(columnar, mode):
+    return f"{mode}{'+columnar' if columnar else ''}"
+
+
+def baseline_path():
+    return os.environ.get("DTX_BENCH_BASELINES") or DEFAULT_BASELINE_PATH
+
+
+def load_baselines(path=None):
+    path = path or baseline_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baselines(results, calibration_ms, columnar=False, mode="full", path=None):
+    """Stores results as this machine's baseline for this parse configuration."""
+    path = path or baseline_path()
+    baselines = load_baselines(path)
+    baselines[_baseline_key(columnar, mode)] = {
+        "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "calibration_ms": calibration_ms,
+        "cases": results,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+    logging.info(f"Baselines saved to '{path}'.")
+
+
+def relative_change(result, base, calibration_ms, base_calibration_ms):
+    """
+    Change in best time against a baseline case, after scaling both by their
+    calibration times; None if there is nothing to compare.
+    """
+    if not base or base["best_ms"] <= 0 or calibration_ms <= 0 or base_calibration_ms <= 0:
+        return None
+    return (result["best_ms"] / calibration_ms) / (base["best_ms"] / base_calibration_ms) - 1
+
+
+def compare(results, baseline, calibration_ms, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares results with a stored baseline (see save_baselines).
+
+    Returns:
+        list: Names of cases whose calibrated best time regressed by more than tolerance.
+    """
+    regressions = []
+    base_calibration_ms = baseline.get("calibration_ms", 0.0)
+    for name, result in results.items():
+        base = baseline.get("cases", {}).get(name)
+        change = relative_change(result, base, calibration_ms, base_calibration_ms)
+        if change is not None and change > tolerance:
+            regressions.append(name)
+            logging.warning(
+                f"Regression in '{name}': {result['best_ms']:.1f}ms vs baseline "
+                f"{base['best_ms']:.1f}ms ({change:+.0%} after calibration)."
+            )
+    return regressions
+
+
+def print_results(results, baseline=None, calibration_ms=0.0):
+    baseline = baseline or {}
+    print(f"{'case':<14}{'lines':>9}{'chips':>9}{'best ms':>10}{'lines/s':>12}{'chips/s':>12}{'peak KiB':>10}{'vs base':>9}")
+    for name, r in results.items():
+        change = relative_change(
+            r, baseline.get("cases", {}).get(name), calibration_ms, baseline.get("calibration_ms", 0.0)
+        )
+        delta = f"{change:+.0%}" if change is not None else "-"
+        print(
+            f"{name:<14}{r['lines']:>9}{r['chips']:>9}{r['best_ms']:>10.1f}"
+            f"{r['lines_per_s']:>12,.0f}{r['chips_per_s']:>12,.0f}{r['peak_kib']:>10,.0f}{delta:>9}"
+        )
+
+
+def main():
+    """Runs the parser benchmark from the command line."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)-7s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    if "--help" in sys.argv:
+        print(
+            "Usage: python bench_parse.py [case ...] [--repeat=N] [--columnar] [--mode=full|header] "
+            "[--save] [--tolerance=F]\n\n"
+            "Run once with --save on a known-good tree to record this machine's baseline\n"
+            f"(in {baseline_path()}, or $DTX_BENCH_BASELINES). Later runs compare against it\n"
+            "and exit 1 if a case's calibrated time grows by more than the tolerance."
+        )
+        sys.exit(0)
+
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    cases = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    columnar = "--columnar" in sys.argv
+    mode = options.get("mode", "full")
+
+    # Per-chart parse logging would swamp the timings.
+    logging.getLogger().setLevel(logging.WARNING)
+    repeat = int(options.get("repeat", 5))
+    calibration_ms = calibrate(repeat)
+    results = run_suite(repeat, columnar, mode, cases or None)
+    logging.getLogger().setLevel(logging.INFO)
+
+    baseline = load_baselines().get(_baseline_key(columnar, mode), {})
+    print_results(results, baseline, calibration_ms)
+    print(f"calibration {calibration_ms:.1f}ms")
+
+    if "--save" in sys.argv:
+        save_baselines(results, calibration_ms, columnar, mode)
+        return
+    if not baseline.get("calibration_ms"):
+        logging.info("No baseline for this machine yet; run with --save to record one.")
+        return
+    if compare(results, baseline, calibration_ms, float(options.get("tolerance", DEFAULT_TOLERANCE))):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
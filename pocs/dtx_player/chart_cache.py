@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import struct
+import hashlib
+import logging
+import time
+from array import array
+from dtx import Dtx
+
+# Sidecar files live next to the chart, like DTXMania's *.score.ini files.
+CACHE_SUFFIX = ".dtxc"
+
+# Bump whenever the set or meaning of CACHED_FIELDS or the layout changes.
+CACHE_VERSION = 4
+
+# magic, version, source size, source mtime (ns), source digest
+_HEADER = struct.Struct("<4sHqq16s")
+_MAGIC = b"DTXC"
+
+# After the header: metadata JSON length and note count, then the JSON, then
+# timed_notes as little-endian columns: times (float64), and channel and WAV
+# IDs (uint16) as indexes into the JSON "strings" table. Sidecars ship inside
+# downloaded song packs, so the format is plain data that cannot run code.
+_BODY = struct.Struct("<II")
+
+# Dtx attributes that make up a compiled chart, stored in the JSON part.
+CACHED_FIELDS = (
+    "title",
+    "artist",
+    "genre",
+    "bpm",
+    "levels",
+    "bpm_changes",
+    "bar_length_changes",
+    "wav_volumes",
+    "bgm_wav_id",
+    "bgm_start_time_ms",
+    "channel_to_default_wav",
+)
+
+
+def cache_path_for(dtx_path):
+    """Returns the sidecar path used to cache the given chart."""
+    return dtx_path + CACHE_SUFFIX
+
+
+def file_digest(path):
+    """Returns a 16-byte BLAKE2b digest of a file's contents."""
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).digest()
+
+
+def _little_endian(values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _to_body(dtx):
+    """Serializes the compiled state of a parsed Dtx (see _BODY)."""
+    meta = {name: getattr(dtx, name) for name in CACHED_FIELDS}
+    # JSON keys are strings, so integer-keyed and tuple data go in as pairs
+    meta["bar_length_changes"] = sorted(dtx.bar_length_changes.items())
+    meta["bpm_events"] = dtx.bpm_events
+    # Store WAV paths relative to the chart so a song folder can be moved.
+    meta["wav_files"] = {
+        wav_id: os.path.relpath(path, dtx.directory) for wav_id, path in dtx.wav_files.items()
+    }
+    if dtx.preview_path:
+        meta["preview_path"] = os.path.relpath(dtx.preview_path, dtx.directory)
+
+    strings = {}
+    times = array("d")
+    channels = array("H")
+    wavs = array("H")
+    for time_ms, channel, wav in dtx.timed_notes:
+        times.append(time_ms)
+        channels.append(strings.setdefault(channel, len(strings)))
+        wavs.append(strings.setdefault(wav, len(strings)))
+    meta["strings"] = list(strings)
+
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    return b"".join((
+        _BODY.pack(len(meta_bytes), len(times)),
+        meta_bytes,
+        _little_endian(times),
+        _little_endian(channels),
+        _little_endian(wavs),
+    ))
+
+
+def _from_body(dtx, data, offset):
+    """
+    Restores the state written by _to_body onto a Dtx.
+
+    Raises:
+        ValueError: If the body is truncated or malformed.
+    """
+    if len(data) < offset + _BODY.size:
+        raise ValueError("truncated body")
+    meta_length, count = _BODY.unpack_from(data, offset)
+    offset += _BODY.size
+    if len(data) != offset + meta_length + 12 * count:
+        raise ValueError("body length does not match its note count")
+    meta = json.loads(data[offset : offset + meta_length].decode("utf-8"))
+    offset += meta_length
+    times = _from_little_endian("d", data[offset : offset + 8 * count])
+    offset += 8 * count
+    channels = _from_little_endian("H", data[offset : offset + 2 * count])
+    offset += 2 * count
+    wavs = _from_little_endian("H", data[offset : offset + 2 * count])
+
+    strings = meta["strings"]
+    for name in CACHED_FIELDS:
+        setattr(dtx, name, meta[name])
+    dtx.bar_length_changes = {int(bar): float(length) for bar, length in meta["bar_length_changes"]}
+    dtx.bpm_events = [(float(tick), float(bpm)) for tick, bpm in meta["bpm_events"]]
+    dtx.timed_notes = [(t, strings[c], strings[w]) for t, c, w in zip(times, channels, wavs)]
+    dtx.wav_files = {
+        wav_id: os.path.join(dtx.directory, path) for wav_id, path in meta["wav_files"].items()
+    }
+    if meta.get("preview_path"):
+        dtx.preview_path = os.path.join(dtx.directory, meta["preview_path"])
+
+
+def save_cached(dtx):
+    """
+    Writes the compiled state of a parsed chart to its sidecar file.
+
+    Args:
+        dtx (Dtx): A chart on which parse() has already been called.
+
+    Returns:
+        bool: True if the sidecar was written.
+    """
+    cache_path = cache_path_for(dtx.dtx_path)
+    try:
+        st = os.stat(dtx.dtx_path)
+        header = _HEADER.pack(
+            _MAGIC, CACHE_VERSION, st.st_size, st.st_mtime_ns, file_digest(dtx.dtx_path)
+        )
+        body = _to_body(dtx)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            f.write(body)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.warning(f"Could not write chart cache '{cache_path}': {e}")
+        return False
+    logging.info(f"Chart cache written: {os.path.basename(cache_path)} ({len(header) + len(body)} bytes)")
+    return True
+
+
+def load_cached(dtx_path):
+    """
+    Loads a chart from its sidecar if the sidecar still matches the source.
+
+    The sidecar is valid when the source size and mtime are unchanged. If only
+    the mtime moved (e.g. the folder was copied), the content digest decides.
+
+    Args:
+        dtx_path (str): Path to the .dtx file.
+
+    Returns:
+        Dtx: The restored chart, or None if there is no valid cache.
+    """
+    cache_path = cache_path_for(dtx_path)
+    try:
+        st = os.stat(dtx_path)
+        with open(cache_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, size, mtime_ns, digest = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != CACHE_VERSION or size != st.st_size:
+        return None
+    if mtime_ns != st.st_mtime_ns:
+        try:
+            if file_digest(dtx_path) != digest:
+                return None
+        except OSError:
+            return None
+
+    try:
+        dtx = Dtx(dtx_path)
+        _from_body(dtx, data, _HEADER.size)
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        logging.warning(f"Discarding unreadable chart cache '{cache_path}': {e}")
+        return None
+    return dtx
+
+
+def load_chart(dtx_path, use_cache=True, columnar=False):
+    """
+    Returns a parsed Dtx, reusing the compiled sidecar when it is still valid.
+
+    Args:
+        dtx_path (str): Path to the .dtx file.
+        use_cache (bool): If False, always parse and do not touch the sidecar.
+        columnar (bool): If True, also provide Dtx.note_columns (needs NumPy).
+
+    Returns:
+        Dtx: The parsed chart.
+    """
+    if use_cache:
+        start = time.perf_counter()
+        dtx = load_cached(dtx_path)
+        if dtx is not None:
+            if columnar:
+                dtx.build_note_columns()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            logging.info(
+                f"Loaded '{os.path.basename(dtx_path)}' from chart cache in {elapsed_ms:.2f}ms "
+                f"({len(dtx.timed_notes)} timed notes)."
+            )
+            return dtx
+
+    dtx = Dtx(dtx_path)
+    dtx.parse(columnar=columnar)
+    if use_cache and dtx.timed_notes:
+        save_cached(dtx)
+    return dtx
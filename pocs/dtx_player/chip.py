@@ -0,0 +1,108 @@
+from array import array
+from bisect import bisect_left
+
+# Lag of a chip with no hit recorded (missed, skipped or pending); far
+# outside every judgement window.
+LAG_UNSET = 32767
+
+# JudgementState.result of a chip nobody judged: pending, auto-played, or
+# passed over by a seek.
+NO_RESULT = 0xFF
+
+
+class Chip:
+    """
+    One timed chip, shared by the parser, the game loop and the display.
+
+    Uses __slots__ so thousands of chips stay small and attribute access in
+    the per-frame loops avoids dict lookups. Channel and WAV IDs are kept both
+    as the original strings (for audio lookups) and as integers (channel as
+    hex, WAV as base36). Everything that depends only on the chip is worked
+    out once when the chip list is built. Judgement state lives in a
+    JudgementState, indexed by Chip.index.
+    """
+
+    __slots__ = (
+        "time",         # Playback time in ms
+        "channel",      # Channel string, e.g. "1A"
+        "wav",          # WAV ID string, e.g. "0Z"
+        "channel_id",   # Channel as an integer (0x1A)
+        "wav_id",       # WAV ID as an integer (base36)
+        "is_playable",  # True if the player can hit it (drum pads)
+        "lane",         # Lane index in the current display layout, -1 if not shown
+        "color",        # Draw colour in the current display layout
+        "index",        # Position in the chip list
+    )
+
+    def __init__(self, time, channel, wav, channel_id, wav_id, is_playable=False, index=0):
+        self.time = time
+        self.channel = channel
+        self.wav = wav
+        self.channel_id = channel_id
+        self.wav_id = wav_id
+        self.is_playable = is_playable
+        self.lane = -1
+        self.color = None
+        self.index = index
+
+    def __repr__(self):
+        return f"Chip({self.time:.2f}ms, ch={self.channel}, wav={self.wav})"
+
+
+class JudgementState:
+    """
+    Per-chip judgement flags for a chip list, indexed by Chip.index.
+
+    Flags are bytearrays next to an array of chip times, so a seek finds its
+    position by bisection and resets every chip on either side with one
+    slice assignment instead of touching chips one by one. Hit lags go in a
+    preallocated int16 array, so recording a hit allocates nothing. The
+    judgement each chip received goes in result, so totals can be recounted
+    after a seek instead of counting chips judged twice.
+    """
+
+    def __init__(self, chips):
+        """
+        Args:
+            chips (list): Chip objects sorted by time.
+        """
+        self.times = array("d", (chip.time for chip in chips))
+        self.judged = bytearray(len(chips))  # Judged or auto-played; no longer pending
+        self.hit = bytearray(len(chips))     # Sounded (hit or auto-played)
+        self.lag = array("h", [LAG_UNSET]) * len(chips)  # Hit time - chip time, ms
+        self.result = bytearray(b"\xff" * len(chips))  # Judgement code, or NO_RESULT
+
+    def __len__(self):
+        return len(self.times)
+
+    def record(self, index, lag_ms, result=NO_RESULT):
+        """Marks a chip as hit with the given lag (ms, positive if late) and judgement code."""
+        self.judged[index] = 1
+        self.hit[index] = 1
+        self.lag[index] = max(-32766, min(32766, round(lag_ms)))
+        self.result[index] = result
+
+    def counts(self, kinds):
+        """Number of chips holding each judgement code 0..kinds-1."""
+        return [self.result.count(code) for code in range(kinds)]
+
+    def index_at(self, time_ms):
+        """Index of the first chip at or after time_ms."""
+        return bisect_left(self.times, time_ms)
+
+    def seek(self, time_ms):
+        """
+        Resets the state for playback from time_ms: earlier chips count as
+        passed, the rest as pending, whichever direction the seek went.
+
+        Returns:
+            int: Index of the first pending chip.
+        """
+        i = self.index_at(time_ms)
+        rest = len(self.times) - i
+        self.judged[:i] = b"\x01" * i
+        self.judged[i:] = bytes(rest)
+        self.hit[i:] = bytes(rest)
+        self.lag[i:] = array("h", [LAG_UNSET]) * rest
+        self.result[i:] = b"\xff" * rest
+        return i
@@ -65,6 +65,7 @@ class DisplayManager:
         self.font = pygame.font.Font(None, 28)
         self.small_font = pygame.font.Font(None, 24)
         
+        self.chips = []
         self.current_layout_name = "STANDARD"
         self._update_layout()
 
@@ -78,6 +79,21 @@ class DisplayManager:
         self.channel_to_lane_map = {
             channel: i for i, lane in enumerate(self.lanes) for channel in lane["channels"]
         }
+        self._assign_lanes()
+
+    def set_chips(self, chips):
+        """Takes the chart's Chip list and works out each chip's lane and colour."""
+        self.chips = chips
+        self._assign_lanes()
+
+    def _assign_lanes(self):
+        """Stores lane index and colour on every chip for the current layout."""
+        lane_and_color = {
+            channel: (i, self.NOTE_TYPE_COLORS.get(channel, self.lanes[i]["color"]))
+            for channel, i in self.channel_to_lane_map.items()
+        }
+        for chip in self.chips:
+            chip.lane, chip.color = lane_and_color.get(chip.channel, (-1, None))
 
     def toggle_layout(self):
         """Switches between available layouts."""
@@ -94,7 +110,9 @@ class DisplayManager:
         pressed = game_state.get("pressed_channels", set())
         self._draw_lane_indicators_with_state(pressed)
         
-        self._draw_notes(game_state["current_time_ms"], game_state["notes_to_play"], game_state["note_index"])
+        self._draw_notes(
+            game_state["current_time_ms"], game_state["notes_to_play"], game_state["judgement"].hit, game_state["note_index"]
+        )
         self._draw_hit_animations(game_state["current_time_ms"], game_state["hit_animations"])
         self._draw_progress_bar(game_state["current_time_ms"], game_state["song_duration_ms"])
         self._draw_info_text(game_state)
@@ -159,30 +177,27 @@ class DisplayManager:
             text_rect = text.get_rect(center=(x_pos + self.LANE_WIDTH // 2, y_pos + 40))
             self.screen.blit(text, text_rect)
 
-    def _draw_notes(self, current_time_ms, notes_to_play, note_index):
+    def _draw_notes(self, current_time_ms, notes_to_play, hit, note_index):
         highway_height = self.JUDGMENT_LINE_Y - self.NOTE_HIGHWAY_TOP_Y
         for i in range(note_index, len(notes_to_play)):
             note = notes_to_play[i]
-            if note.get("hit", False):
+            if hit[i]:
                 continue
-                
-            note_time = note["time"]
-            channel_id = note["channel"]
             
-            time_until_hit = note_time - current_time_ms
+            time_until_hit = note.time - current_time_ms
             if time_until_hit > self.SCROLL_TIME_MS:
                 break
             if time_until_hit >= 0:
                 progress = 1.0 - (time_until_hit / self.SCROLL_TIME_MS)
                 y_pos = self.NOTE_HIGHWAY_TOP_Y + (progress * highway_height)
-                if channel_id in self.channel_to_lane_map:
-                    lane_index = self.channel_to_lane_map[channel_id]
-                    color = self.NOTE_TYPE_COLORS.get(channel_id, self.lanes[lane_index]["color"])
+                lane_index = note.lane
+                if lane_index >= 0:
+                    color = note.color
                     x_pos = self.note_highway_x_start + lane_index * self.LANE_WIDTH
                     note_rect = pygame.Rect(x_pos + 2, y_pos - 3, self.LANE_WIDTH - 4, 7)
-                    if channel_id == "18":
+                    if note.channel_id == 0x18:
                         pygame.draw.rect(self.screen, color, note_rect, 2)
-                    elif channel_id == "1B":
+                    elif note.channel_id == 0x1B:
                         pedal_rect = pygame.Rect(x_pos + 2, y_pos - 1, self.LANE_WIDTH - 4, 3)
                         pygame.draw.rect(self.screen, color, pedal_rect)
                     else:
@@ -226,6 +241,11 @@ class DisplayManager:
             f"Judgment: {s.get('last_judgment', '')}",
             f"{s.get('midi_status', 'MIDI: ???')}",
         ]
+        if s.get("practice"):
+            texts.append(f"{s['practice']} (Exit: L, Speed: , .)")
+        done, total = s.get("load_progress", (0, 0))
+        if done < total:
+            texts.append(f"Loading samples: {done}/{total}")
         for i, text in enumerate(texts):
             surface = self.font.render(text, True, self.COLOR_TEXT)
             self.screen.blit(surface, (10, 10 + i * 30))
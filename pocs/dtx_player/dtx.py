@@ -1,6 +1,31 @@
 import os
 import re
+import sys
 import logging
+from chip import Chip
+from tempo import TICKS_PER_MEASURE, TempoMap, position_to_tick
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Object placement keys: 3-digit measure number followed by a 2-char channel.
+OBJECT_KEY_RE = re.compile(r"^\d{3}[0-9A-Z]{2}$")
+
+# Row layout of Dtx.note_columns: time in ms, channel and WAV ID as integers.
+NOTE_DTYPE = [("time", "f8"), ("channel", "u1"), ("wav", "u2")]
+
+# Byte-order marks, checked longest first.
+_BOMS = (
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+)
+
+# How many leading bytes are inspected when sniffing BOM-less UTF-16.
+_SNIFF_BYTES = 4096
 
 
 def base36_to_int(s):
@@ -11,6 +36,68 @@ def base36_to_int(s):
         return 0
 
 
+def channel_to_int(channel):
+    """Converts a 2-digit hex channel string (e.g. '1A') to an integer."""
+    try:
+        return int(channel, 16)
+    except (ValueError, TypeError):
+        return 0
+
+
+def detect_encoding(data):
+    """
+    Guesses the text encoding of raw DTX bytes without decoding them fully.
+
+    BOMs are honoured first. BOM-less UTF-16 is recognised by the NUL bytes
+    that ASCII command characters leave in every other position of a short
+    prefix. Anything else is UTF-8 if it validates, otherwise Shift-JIS
+    (cp932), which is what DTXMania itself assumes.
+
+    Args:
+        data (bytes): The raw file contents.
+
+    Returns:
+        str: A codec name suitable for bytes.decode().
+    """
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return encoding
+
+    prefix = data[:_SNIFF_BYTES]
+    if len(prefix) >= 2:
+        half = len(prefix) // 2
+        odd_nuls = prefix[1::2].count(0)
+        even_nuls = prefix[0::2].count(0)
+        if odd_nuls > half * 0.3 and odd_nuls > even_nuls * 4:
+            return "utf-16-le"
+        if even_nuls > half * 0.3 and even_nuls > odd_nuls * 4:
+            return "utf-16-be"
+
+    if data.isascii():
+        return "utf-8"
+    try:
+        # A cp932 file fails at its first multi-byte character, so this is
+        # cheap for the common case and decisive for real UTF-8.
+        data.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp932"
+
+
+def decode_dtx_bytes(data):
+    """
+    Decodes raw DTX bytes in a single pass using detect_encoding().
+
+    Args:
+        data (bytes): The raw file contents.
+
+    Returns:
+        tuple: (text, encoding) where undecodable bytes are replaced.
+    """
+    encoding = detect_encoding(data)
+    return data.decode(encoding, errors="replace"), encoding
+
+
 class Dtx:
     """
     Parses a .dtx file, processes its metadata, and calculates the precise
@@ -34,6 +121,25 @@ class Dtx:
         "90", "91", "92",
     }
 
+    # Chip channels of each instrument part, used by parse(parts=...). This
+    # covers the classic DTX lanes: active, hidden and no-chip drum lanes,
+    # and the 0x20/0xA0 guitar and bass blocks with their no-chip lanes.
+    PART_CHANNELS = {
+        "drums": frozenset(
+            [f"{c:02X}" for c in range(0x11, 0x1D)]
+            + [f"{c:02X}" for c in range(0x31, 0x3D)]
+            + ["B1", "B2", "B3", "B4", "B5", "B6", "B7", "B8", "B9", "BC", "BD", "BE"]
+        ),
+        "guitar": frozenset([f"{c:02X}" for c in range(0x20, 0x30)] + ["BA"]),
+        "bass": frozenset([f"{c:02X}" for c in range(0xA0, 0xB0)] + ["BB"]),
+    }
+
+    # Channels whose chips change the tempo instead of playing a sound.
+    BPM_CHANNELS = ("03", "08")
+
+    # Difficulty headers for drums, guitar and bass.
+    LEVEL_KEYS = ("DLEVEL", "GLEVEL", "BLEVEL")
+
     def __init__(self, dtx_path):
         """
         Initializes the Dtx object with the path to the .dtx file.
@@ -52,20 +158,30 @@ class Dtx:
         # Metadata with default values
         self.title = "Untitled"
         self.artist = "Unknown"
+        self.genre = ""
         self.bpm = 120.0
+        self.levels = {}  # Maps "DLEVEL"/"GLEVEL"/"BLEVEL" to its integer value
+        self.preview_path = None
 
         # Resource definitions
         self.wav_files = {}  # Maps WAV ID (str) to its file path
         self.bpm_changes = {}  # Maps BPM ID (str) to a BPM value (float)
         self.bar_length_changes = {}  # Maps bar number to a length multiplier (float)
+        self.bpm_events = []  # Chronological (tick, bpm) from channels 03/08
         self.wav_volumes = {}  # Maps WAV ID to volume (0-100) from #VOLUME
         self.bgm_wav_id = None
         self.bgm_start_time_ms = 0.0
 
         # The final calculated event list
-        self.timed_notes = []  # List of (time_in_ms, wav_id_str)
+        self.timed_notes = []  # List of (time_in_ms, channel_str, wav_id_str)
         self.channel_to_default_wav = {}
 
+        # Object lines grouped by measure, kept for iter_events()
+        self._measure_lines = None
+
+        # Optional columnar copy of timed_notes (structured NOTE_DTYPE array)
+        self.note_columns = None
+
     def _split_line(self, line):
         """
         Helper to robustly split a DTX command line into a key and value.
@@ -82,59 +198,121 @@ class Dtx:
         # Handle commands with no value, like '#END'
         return line, ""
 
-    def parse(self):
+    def _read_text(self):
         """
-        Parses the DTX file in two main stages:
-        1. First Pass: Gathers all definitions (metadata, WAVs, BPMs, bar lengths).
-        2. Second Pass: Processes the timeline, calculating the precise time
-           for each event based on the current BPM and bar lengths.
+        Reads the file once and decodes it with the detected encoding.
+
+        Returns:
+            tuple: (text, encoding), or None if the file could not be read.
         """
-        logging.info(f"--- Pass 1: Parsing '{os.path.basename(self.dtx_path)}' ---")
+        try:
+            with open(self.dtx_path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            logging.error(f"Could not read '{self.dtx_path}': {e}")
+            return None
+        return decode_dtx_bytes(data)
+
+    def _iter_commands(self, content, skip_objects=False, skip_channels=frozenset()):
+        """
+        Tokenizes decoded DTX text line by line.
 
-        raw_events = []
+        Object lines (#MMMCC) can be dropped here, before they are split or
+        expanded into chips: all of them with skip_objects, or only those whose
+        channel is in skip_channels.
 
-        # --- First Pass: Gather all definitions from the file ---
-        # Try to read the file with multiple encodings and choose the one that
-        # produces the most valid-looking DTX command lines (starting with '#').
-        best_content = None
-        best_encoding = None
-        max_command_lines = 0
+        Yields:
+            tuple: (raw_key, raw_value) for every line starting with '#',
+            with the '#' removed.
+        """
+        for line in content.splitlines():
+            line = line.strip()
+            if not line or line[0] != "#":
+                continue
+            if line[1:4].isdigit() and (skip_objects or line[4:6].upper() in skip_channels):
+                continue
+            yield self._split_line(line[1:])
+
+    def _skipped_channels(self, parts):
+        """Returns the chip channels that belong to parts other than `parts`."""
+        if parts is None:
+            return frozenset()
+        unknown = set(parts) - set(self.PART_CHANNELS)
+        if unknown:
+            raise ValueError(f"Unknown part(s) {sorted(unknown)}; expected {sorted(self.PART_CHANNELS)}")
+        return frozenset().union(
+            *(channels for part, channels in self.PART_CHANNELS.items() if part not in parts)
+        )
 
-        # Common encodings for DTX files, with cp932 (Shift-JIS) often being correct.
-        for encoding in ["cp932", "utf-16-le", "utf-8-sig", "utf-8"]:
-            try:
-                with open(self.dtx_path, "r", encoding=encoding) as f:
-                    lines = f.readlines()
+    def parse(self, columnar=False, mode="full", parts=None):
+        """
+        Parses the DTX file in two main stages:
+        1. First Pass: Gathers all definitions (metadata, WAVs, BPMs, bar lengths).
+        2. Second Pass: Processes the timeline, calculating the precise time
+           for each event based on the current BPM and bar lengths.
 
-                # Heuristic: The correct encoding should yield many command lines.
-                command_lines = sum(1 for line in lines if line.strip().startswith("#"))
+        Args:
+            columnar (bool): If True and NumPy is available, run the vectorized
+                timing pass and also fill note_columns.
+            mode (str): "full" for everything, or "header" to read only header
+                commands (TITLE, ARTIST, DLEVEL, BPM, PREVIEW, WAV, ...) and skip
+                object lines and the second pass.
+            parts (iterable): Instrument parts to keep, from PART_CHANNELS
+                (e.g. ("drums",) or ("guitar", "bass")). Chips of the other
+                parts are dropped while tokenizing. BGM, BPM and SE channels
+                are always kept. None keeps every part.
 
-                if command_lines > max_command_lines:
-                    max_command_lines = command_lines
-                    best_content = lines
-                    best_encoding = encoding
+        Raises:
+            ValueError: If mode or parts is not recognised.
+        """
+        if mode not in ("full", "header"):
+            raise ValueError(f"Unknown parse mode '{mode}'; expected 'full' or 'header'")
+        skip_channels = self._skipped_channels(parts)
+        header_only = mode == "header"
 
-            except (UnicodeDecodeError, UnicodeError):
-                continue  # This encoding is incorrect, try the next one.
-            except Exception as e:
-                logging.error(f"An unexpected error occurred while reading with {encoding}: {e}")
+        if columnar and np is None:
+            logging.warning("NumPy is not installed; falling back to the list-based timing pass.")
+            columnar = False
 
-        if not best_content:
-            logging.error("Could not read or decode the file with any supported encodings.")
+        object_lines = self._first_pass(header_only, skip_channels)
+        if object_lines is None:
+            return
+        if header_only:
+            logging.info(f"Header-only parse: found {len(self.wav_files)} WAVs; skipping timings.")
             return
 
-        content = best_content
         logging.info(
-            f"Successfully read file using encoding '{best_encoding}' ({max_command_lines} command lines found)."
+            f"Found {len(self.wav_files)} WAVs, {len(self.bar_length_changes)} bar length changes, and {len(object_lines)} object lines."
         )
 
-        for line in content:
-            line = line.strip()
-            if not line or not line.startswith("#"):
-                continue
+        # --- Second Pass: Calculate event timings ---
+        logging.info("--- Pass 2: Calculating event timings ---")
+        self._measure_lines = self._group_by_measure(object_lines)
+        if columnar:
+            self._compute_timings_columnar(object_lines)
+        else:
+            self._compute_timings()
+        logging.info(f"Successfully parsed {len(self.timed_notes)} timed notes.")
 
-            raw_key, raw_value = self._split_line(line[1:])
+    def _first_pass(self, header_only=False, skip_channels=frozenset()):
+        """
+        Reads the file and gathers all definitions (metadata, WAVs, BPMs, bar
+        lengths). Object lines are kept whole; chips are expanded later.
 
+        Returns:
+            list: (bar, channel, value) for every object line in file order,
+            or None if the file could not be read.
+        """
+        logging.info(f"--- Pass 1: Parsing '{os.path.basename(self.dtx_path)}' ---")
+        object_lines = []
+
+        decoded = self._read_text()
+        if decoded is None:
+            return None
+        content, encoding = decoded
+        logging.info(f"Successfully read file using encoding '{encoding}'.")
+
+        for raw_key, raw_value in self._iter_commands(content, header_only, skip_channels):
             key = raw_key.strip().upper()
             value = raw_value.strip().split(";")[0].strip()  # Remove comments
 
@@ -142,6 +320,15 @@ class Dtx:
                 self.title = value
             elif key == "ARTIST":
                 self.artist = value
+            elif key == "GENRE":
+                self.genre = value
+            elif key in self.LEVEL_KEYS and value:
+                try:
+                    self.levels[key] = int(value)
+                except ValueError:
+                    logging.warning(f"Invalid {key} value '{value}'")
+            elif key == "PREVIEW" and value:
+                self.preview_path = os.path.join(self.directory, value.replace("\\", "/"))
             elif key == "BPM" and value:
                 try:
                     self.bpm = float(value)
@@ -167,7 +354,7 @@ class Dtx:
                         f"Invalid VOLUME value '{value}' for WAV ID {wav_id}"
                     )
             # Check for note/event data lines (e.g., #00108: ...)
-            elif len(key) == 5 and re.match(r"^\d{3}[0-9A-Z]{2}$", key):
+            elif len(key) == 5 and OBJECT_KEY_RE.match(key):
                 bar_num = int(key[0:3])
                 channel = key[3:5]
 
@@ -190,99 +377,297 @@ class Dtx:
                 if not value:
                     continue
 
-                notes = [value[i : i + 2] for i in range(0, len(value), 2)]
-                if not notes:
-                    continue
+                if channel not in self.channel_to_default_wav:
+                    for i in range(0, len(value), 2):
+                        if value[i : i + 2] != "00":
+                            self.channel_to_default_wav[channel] = value[i : i + 2]
+                            break
+                object_lines.append((bar_num, channel, value))
 
-                total_notes = len(notes)
-                for i, note_val in enumerate(notes):
-                    if note_val != "00":
-                        if channel not in self.channel_to_default_wav:
-                            self.channel_to_default_wav[channel] = note_val
-                        raw_events.append(
-                            {
-                                "bar": bar_num,
-                                "channel": channel,
-                                "pos": i,
-                                "total_pos": total_notes,
-                                "val": note_val,
-                            }
-                        )
-        
         logging.info(f"Discovered Metadata -> Title: '{self.title}', Artist: '{self.artist}', Base BPM: {self.bpm}")
-
-        logging.info(
-            f"Found {len(self.wav_files)} WAVs, {len(self.bar_length_changes)} bar length changes, and {len(raw_events)} raw events."
-        )
-
-        # --- Second Pass: Calculate event timings ---
-        logging.info("--- Pass 2: Calculating event timings ---")
-        
-        # Pre-calculate the starting beat of each bar to handle time signature changes
-        max_bar = 0
-        if raw_events:
-            max_bar = max(e["bar"] for e in raw_events)
-
-        bar_start_beats = {0: 0.0}
-        for i in range(max_bar + 1):
-            bar_length_multiplier = self.bar_length_changes.get(i, 1.0)
-            beats_in_bar = 4.0 * bar_length_multiplier
-            bar_start_beats[i + 1] = bar_start_beats[i] + beats_in_bar
-
-        # Annotate each event with its precise global beat number
-        for event in raw_events:
-            bar_num = event["bar"]
-            # Get the length of the specific bar the event is in
-            bar_len_multiplier = self.bar_length_changes.get(bar_num, 1.0)
-            beats_in_this_bar = 4.0 * bar_len_multiplier
-
-            # Position within the bar (0.0 to 1.0) * beats in this bar
-            event_beat_in_bar = (event["pos"] / event["total_pos"]) * beats_in_this_bar
-
-            # Global beat is the sum of beats before this bar + beat pos in this bar
-            event["global_beat"] = bar_start_beats[bar_num] + event_beat_in_bar
-
-        # Sort events by their calculated global beat to process them chronologically
-        raw_events.sort(key=lambda x: x["global_beat"])
+        return object_lines
+
+    @staticmethod
+    def _group_by_measure(object_lines):
+        """Groups object lines into {bar: [(channel, value), ...]} in file order."""
+        measure_lines = {}
+        for bar, channel, value in object_lines:
+            measure_lines.setdefault(bar, []).append((channel, value))
+        return measure_lines
+
+    def _bpm_event_value(self, channel, value):
+        """Returns the BPM set by a channel 03/08 event, or -1 if it sets none."""
+        if channel == "03":  # Direct BPM change (hexadecimal value)
+            try:
+                return float(int(value, 16))
+            except (ValueError, TypeError):
+                logging.warning(f"Invalid direct BPM value '{value}'")
+        elif channel == "08":  # BPM change from predefined list
+            if value in self.bpm_changes:
+                return self.bpm_changes[value]
+        return -1
+
+    def _iter_timeline(self):
+        """
+        Yields (time_ms, bar, pos, total_pos, channel, val, bpm) for every chip
+        in chronological order, where bpm is the tempo set by a 03/08 chip or
+        -1 for notes.
+
+        Measures are visited in order and only one measure's chips are alive
+        at a time. Each object line is already a position-ordered run, so
+        sorting a measure's chips is a cheap Timsort merge of those runs. At
+        a shared position BPM chips come first in file order, then notes by
+        (channel, val), which matches the order of the sorted timed_notes.
+        """
+        measure_lines = self._measure_lines or {}
+        max_bar = max(measure_lines, default=-1)
 
         current_time_s = 0.0
         current_bpm = self.bpm
         last_event_beat = 0.0
-        first_bgm_event_processed = False
+        bar_start_beat = 0.0
+
+        for bar in range(max_bar + 1):
+            bar_length_multiplier = self.bar_length_changes.get(bar, 1.0)
+            chips = []
+            for order, (channel, value) in enumerate(measure_lines.get(bar, ())):
+                total_pos = (len(value) + 1) // 2
+                is_note = channel not in self.BPM_CHANNELS
+                tie_key = channel if is_note else order
+                for pos in range(total_pos):
+                    note_val = value[2 * pos : 2 * pos + 2]
+                    if note_val != "00":
+                        chips.append((pos / total_pos, is_note, tie_key, note_val, pos, total_pos, channel))
+            chips.sort()
+
+            for fraction, is_note, _, value, pos, total_pos, channel in chips:
+                # Global beat is the sum of beats before this bar + beat pos in this bar
+                global_beat = bar_start_beat + fraction * 4.0 * bar_length_multiplier
+
+                # Calculate time elapsed since the last event using the current BPM
+                delta_beats = global_beat - last_event_beat
+                if current_bpm > 0:
+                    delta_time_s = delta_beats * (60.0 / current_bpm)
+                else:
+                    delta_time_s = 0  # Avoid division by zero if BPM is 0
+                event_time_s = current_time_s + delta_time_s
+
+                if is_note:
+                    yield (event_time_s * 1000, bar, pos, total_pos, channel, value, -1)
+                else:
+                    new_bpm = self._bpm_event_value(channel, value)
+                    if new_bpm != -1:
+                        yield (event_time_s * 1000, bar, pos, total_pos, channel, value, new_bpm)
+                        if new_bpm != current_bpm:
+                            logging.info(
+                                f"BPM change at beat {global_beat:.2f} ({event_time_s*1000:.2f}ms): {current_bpm:.2f} -> {new_bpm:.2f}"
+                            )
+                            current_bpm = new_bpm
 
-        for event in raw_events:
-            # Calculate time elapsed since the last event using the current BPM
-            delta_beats = event["global_beat"] - last_event_beat
-            if current_bpm > 0:
-                delta_time_s = delta_beats * (60.0 / current_bpm)
+                # Update state for the next iteration
+                current_time_s = event_time_s
+                last_event_beat = global_beat
+
+            bar_start_beat += 4.0 * bar_length_multiplier
+
+    def iter_events(self):
+        """
+        Lazily yields timed chips as (time_ms, channel, wav) in chronological
+        order without building the full event list.
+
+        Runs the first pass if parse() has not been called. For a chart
+        restored from the chart cache (no object lines kept), the stored
+        timed_notes are replayed instead.
+
+        Yields:
+            tuple: (time_in_ms, channel_str, wav_id_str)
+        """
+        if self._measure_lines is None:
+            if self.timed_notes:
+                yield from self.timed_notes
+                return
+            object_lines = self._first_pass()
+            if object_lines is None:
+                return
+            self._measure_lines = self._group_by_measure(object_lines)
+
+        for time_ms, _, _, _, channel, value, bpm in self._iter_timeline():
+            if bpm == -1:
+                yield time_ms, channel, value
+
+    def _compute_timings(self):
+        """Fills timed_notes and bpm_events from the streaming timeline."""
+        timed_notes = []
+        bpm_events = []
+        for time_ms, bar, pos, total_pos, channel, value, bpm in self._iter_timeline():
+            if bpm == -1:
+                timed_notes.append((time_ms, channel, value))
             else:
-                delta_time_s = 0 # Avoid division by zero if BPM is 0
-            event_time_s = current_time_s + delta_time_s
+                bpm_events.append((position_to_tick(bar, pos, total_pos), bpm))
+        # Already chronological; the sort only matters for zero-BPM stretches.
+        timed_notes.sort()
+        self.timed_notes = timed_notes
+        self.bpm_events = bpm_events
+
+    def _compute_timings_columnar(self, object_lines):
+        """
+        Vectorized equivalent of _compute_timings.
 
-            # Process the event based on its channel to see if it's a note or a BPM change
-            channel, value = event["channel"], event["val"]
-            
-            new_bpm = -1
+        Chips are cut out of all object lines at once as 2-byte pairs. Bar
+        start beats come from a cumulative sum of bar lengths, and each note's
+        beat is mapped to time through piecewise-constant BPM segments located
+        with searchsorted. Fills both note_columns and timed_notes.
 
-            if channel == "03":  # Direct BPM change (hexadecimal value)
-                try:
-                    new_bpm = float(int(value, 16))
-                except (ValueError, TypeError):
-                    logging.warning(f"Invalid direct BPM value '{value}'")
-            elif channel == "08":  # BPM change from predefined list
-                if value in self.bpm_changes:
-                    new_bpm = self.bpm_changes[value]
-            else:  # Any other channel is a note.
-                self.timed_notes.append((event_time_s * 1000, channel, value))
-
-            # If BPM changed, log it and update state
-            if new_bpm != -1 and new_bpm != current_bpm:
-                logging.info(f"BPM change at beat {event['global_beat']:.2f} ({event_time_s*1000:.2f}ms): {current_bpm:.2f} -> {new_bpm:.2f}")
-                current_bpm = new_bpm
-
-            # Update state for the next iteration
-            current_time_s = event_time_s
-            last_event_beat = event["global_beat"]
-
-        self.timed_notes.sort()
-        logging.info(f"Successfully parsed {len(self.timed_notes)} timed notes.")
+        Args:
+            object_lines (list): (bar, channel, value) for every object line,
+                in file order.
+        """
+        # Intern channel strings; per-line arrays refer to them by index.
+        channel_names = list(dict.fromkeys(ch for _, ch, _ in object_lines))
+        channel_index = {ch: i for i, ch in enumerate(channel_names)}
+        line_bars = np.array([bar for bar, _, _ in object_lines], dtype=np.int64)
+        line_channels = np.array([channel_index[ch] for _, ch, _ in object_lines], dtype=np.int64)
+        # An odd trailing character is its own one-character chip, as in the
+        # list-based pass; a NUL pad byte is dropped again by the S2 dtype.
+        values = [val if len(val) % 2 == 0 else val + "\0" for _, _, val in object_lines]
+        line_counts = np.array([len(val) // 2 for val in values], dtype=np.int64)
+
+        pairs = np.frombuffer("".join(values).encode("latin-1", errors="replace"), dtype="S2")
+        pair_lines = np.repeat(np.arange(len(object_lines)), line_counts)
+        line_offsets = np.concatenate(([0], np.cumsum(line_counts)[:-1])).astype(np.int64)
+        pair_positions = np.arange(len(pairs)) - line_offsets[pair_lines]
+
+        # Keep non-empty chips, still in file order, and intern their values.
+        chip_mask = pairs != b"00"
+        chip_lines = pair_lines[chip_mask]
+        chip_bars = line_bars[chip_lines]
+        chip_channels = line_channels[chip_lines]
+        chip_fractions = pair_positions[chip_mask] / line_counts[chip_lines]
+        value_codes, chip_values = np.unique(pairs[chip_mask].view(np.uint16), return_inverse=True)
+        value_names = [v.decode("latin-1") for v in value_codes.view("S2").tolist()]
+
+        max_bar = int(chip_bars.max()) if len(chip_bars) else 0
+        bar_lengths = np.ones(max_bar + 1)
+        for bar, multiplier in self.bar_length_changes.items():
+            if 0 <= bar <= max_bar:
+                bar_lengths[bar] = multiplier
+        beats_in_bar = 4.0 * bar_lengths
+        bar_start_beats = np.concatenate(([0.0], np.cumsum(beats_in_bar)))
+        global_beats = bar_start_beats[chip_bars] + chip_fractions * beats_in_bar[chip_bars]
+
+        # BPM segments in beat order; a stable sort keeps file order on ties.
+        bpm_ids = [channel_index[ch] for ch in ("03", "08") if ch in channel_index]
+        is_bpm = np.isin(chip_channels, bpm_ids)
+        bpm_indices = np.flatnonzero(is_bpm)
+        bpm_values = np.array(
+            [
+                self._bpm_event_value(channel_names[chip_channels[i]], value_names[chip_values[i]])
+                for i in bpm_indices.tolist()
+            ],
+            dtype=np.float64,
+        )
+        valid = bpm_values != -1
+        bpm_indices, bpm_values = bpm_indices[valid], bpm_values[valid]
+        bpm_beats = global_beats[bpm_indices]
+        order = np.argsort(bpm_beats, kind="stable")
+        bpm_ticks = (chip_bars[bpm_indices] + chip_fractions[bpm_indices]) * TICKS_PER_MEASURE
+        self.bpm_events = list(zip(bpm_ticks[order].tolist(), bpm_values[order].tolist()))
+        segment_beats = np.concatenate(([0.0], bpm_beats[order]))
+        segment_bpms = np.concatenate(([self.bpm], bpm_values[order]))
+        with np.errstate(divide="ignore"):
+            seconds_per_beat = np.where(segment_bpms > 0, 60.0 / segment_bpms, 0.0)
+        segment_start_s = np.concatenate(
+            ([0.0], np.cumsum(np.diff(segment_beats) * seconds_per_beat[:-1]))
+        )
+
+        note_indices = np.flatnonzero(~is_bpm)
+        note_beats = global_beats[note_indices]
+        segment = np.searchsorted(segment_beats, note_beats, side="right") - 1
+        times_ms = (
+            segment_start_s[segment] + (note_beats - segment_beats[segment]) * seconds_per_beat[segment]
+        ) * 1000.0
+
+        channel_codes = np.array([channel_to_int(ch) for ch in channel_names], dtype=np.uint8)
+        wav_codes = np.array([base36_to_int(val) for val in value_names], dtype=np.uint16)
+        columns = np.empty(len(note_indices), dtype=NOTE_DTYPE)
+        columns["time"] = times_ms
+        columns["channel"] = channel_codes[chip_channels[note_indices]]
+        columns["wav"] = wav_codes[chip_values[note_indices]]
+
+        # Same ordering as sorting (time, channel, wav) tuples.
+        order = np.lexsort((columns["wav"], columns["channel"], columns["time"]))
+        self.note_columns = columns[order]
+        sorted_chips = note_indices[order].tolist()
+        self.timed_notes = list(
+            zip(
+                self.note_columns["time"].tolist(),
+                [channel_names[i] for i in chip_channels[sorted_chips].tolist()],
+                [value_names[i] for i in chip_values[sorted_chips].tolist()],
+            )
+        )
+
+    def tempo_map(self, rounding=None):
+        """
+        Builds a TempoMap from the base BPM, the BPM events and the bar
+        length changes found by parse().
+
+        Args:
+            rounding (int): None, tempo.ROUND_TRUNCATE or tempo.ROUND_NEAREST.
+
+        Returns:
+            TempoMap: Tick/time conversions consistent with timed_notes.
+        """
+        return TempoMap(self.bpm, self.bpm_events, self.bar_length_changes, rounding=rounding)
+
+    def build_chips(self, playable_channels=()):
+        """
+        Builds the Chip list used by the game loop and display.
+
+        Channel and WAV strings are interned and converted to integers once
+        per distinct value, not once per chip.
+
+        Args:
+            playable_channels (iterable): Channels the player can hit.
+
+        Returns:
+            list: One Chip per entry of timed_notes, in the same order.
+        """
+        playable_channels = frozenset(playable_channels)
+        channels = {}
+        wavs = {}
+        chips = []
+        for time_ms, channel, wav in self.timed_notes:
+            if channel not in channels:
+                channels[channel] = (sys.intern(channel), channel_to_int(channel))
+            if wav not in wavs:
+                wavs[wav] = (sys.intern(wav), base36_to_int(wav))
+            channel, channel_id = channels[channel]
+            wav, wav_id = wavs[wav]
+            chips.append(Chip(time_ms, channel, wav, channel_id, wav_id, channel in playable_channels, len(chips)))
+        return chips
+
+    def build_note_columns(self):
+        """
+        Builds note_columns from timed_notes, e.g. for a chart restored from
+        the chart cache or parsed without columnar=True.
+
+        Returns:
+            numpy.ndarray: The structured array (also stored on the instance).
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for the columnar chart representation.")
+        columns = np.empty(len(self.timed_notes), dtype=NOTE_DTYPE)
+        columns["time"] = [t for t, _, _ in self.timed_notes]
+        columns["channel"] = [channel_to_int(c) for _, c, _ in self.timed_notes]
+        columns["wav"] = [base36_to_int(w) for _, _, w in self.timed_notes]
+        self.note_columns = columns
+        return columns
+
+    def note_range(self, start_ms, end_ms):
+        """
+        Returns the index range [first, last) of notes timed within
+        [start_ms, end_ms), found by binary search over note_columns.
+        """
+        times = self.note_columns["time"]
+        first, last = np.searchsorted(times, (start_ms, end_ms), side="left")
+        return int(first), int(last)
@@ -6,8 +6,20 @@ except ImportError:
     pass
 import logging
 import time
+from array import array
 from audio import AudioManager
 from display import DisplayManager
+from mixer import MixerStream
+from midi_input import PAD_DOWN, SOURCE_KEYBOARD, MidiInput
+from input_log import InputRecorder, ReplayInput
+from practice import SPEED_STEP, SectionLoop
+from tracing import MARK_LATENESS, SPAN_DRAW, SPAN_FRAME, SPAN_INPUT, SPAN_MIX, SPAN_PLAY, SPAN_UPDATE, Tracer
+from lane_index import LaneIndex
+from chip import JudgementState
+from master_clock import MasterClock
+from ghost import ghost_chips, ghost_path_for, session_log_path, write_ghost, write_session_log
+from sample_cache import PcmCache
+from sample_pool import get_sample_pool
 
 class Game:
     """Orchestrates the main game loop, input handling, and state management."""
@@ -29,54 +41,95 @@ class Game:
         57: "16", # R.Cym
     }
 
-    def __init__(self, dtx_data):
+    # Channels the player can hit; everything else is always auto-played.
+    # Left bass drum has no pad but is reachable through the pedal group.
+    PLAYABLE_CHANNELS = frozenset(GM_MIDI_MAP.values()) | {"1C"}
+
+    # Judgment Windows (ms)
+    PERFECT_MS = 30
+    GREAT_MS = 60
+    GOOD_MS = 100
+    POOR_MS = 150
+
+    JUDGEMENTS = ("PERFECT", "GREAT", "GOOD", "POOR", "MISS")
+
+    def __init__(
+        self,
+        dtx_data,
+        use_cache=True,
+        choke_groups=None,
+        audio_latency_ms=0.0,
+        input_adjust_ms=0.0,
+        headless=False,
+        record_input=True,
+        replay=None,
+        loop_measures=None,
+        practice_speed=1.0,
+        trace_path=None,
+    ):
+        """
+        Args:
+            headless (bool): Judgement only, with no window, audio or MIDI;
+                the caller drives the clock (see simulate.py).
+            record_input (bool): Log raw input to an input log (see input_log.py).
+            replay (list): Input log records to play back instead of reading MIDI.
+            loop_measures (tuple): (first, last) measures to loop from the
+                start (see start_practice); also used by the L key.
+            practice_speed (float): Speed for practice loops, 0.5-1.0.
+            trace_path (str): If set, frame stages are traced (see tracing.Tracer),
+                summarised on exit and written here as Chrome trace JSON.
+        """
         self.dtx = dtx_data
-        self.audio_manager = AudioManager(dtx_data)
-        self.display_manager = DisplayManager(dtx_data)
+        self.headless = headless
+        self.audio_manager = None
+        self.display_manager = None
+        if not headless:
+            self.audio_manager = AudioManager(
+                dtx_data, PcmCache() if use_cache else None, get_sample_pool(), choke_groups
+            )
+            self.display_manager = DisplayManager(dtx_data)
         
-        # Convert tuples to dicts for mutable state
-        self.notes_to_play = [
-            {"time": t, "channel": c, "wav": w, "hit": False, "judged": False} 
-            for t, c, w in self.dtx.timed_notes
-        ]
+        # Hit/judged flags live in self.judgement so seeks can reset them in bulk
+        self.notes_to_play = self.dtx.build_chips(self.PLAYABLE_CHANNELS)
+        self.judgement = JudgementState(self.notes_to_play)
+        if self.display_manager:
+            self.display_manager.set_chips(self.notes_to_play)
+        self.lane_index = LaneIndex(self.notes_to_play, self.judgement.judged)
         
-        self.song_duration_ms = self.notes_to_play[-1]["time"] + 3000 if self.notes_to_play else 0
+        self.song_duration_ms = self.notes_to_play[-1].time + 3000 if self.notes_to_play else 0
         
         self.auto_mode = True # Default to Auto
+        self.mixer_stream = None # Sample-accurate chip playback, set up in run()
         self.last_judgment = ""
+        self.judgement_counts = dict.fromkeys(self.JUDGEMENTS, 0)
 
-        # MIDI Init
-        self.midi_input = None
-        self.midi_status = "MIDI: Init..."
-        try:
-            import mido
-            inputs = mido.get_input_names()
-            logging.info(f"Available MIDI Inputs: {inputs}")
-            
-            target_port = None
-            # Filter out "Midi Through" if possible, unless it's the only one
-            for name in inputs:
-                if "Through" not in name:
-                    target_port = name
-                    break
-            
-            if not target_port and inputs:
-                target_port = inputs[0]
-            
-            if target_port:
-                self.midi_input = mido.open_input(target_port)
-                logging.info(f"Opened MIDI Input: {target_port}")
-                self.midi_status = f"MIDI: {target_port}"
-            else:
-                self.midi_status = "MIDI: No Devices Found"
-                
-        except Exception as e:
-            logging.error(f"Failed to initialize MIDI: {e}")
-            self.midi_status = "MIDI: Error"
+        # Master clock, disciplined against the BGM while it plays; the MIDI
+        # thread stamps hits with it directly
+        self.clock = MasterClock(audio_latency_ms, input_adjust_ms)
 
-        # Time synchronization
+        # MIDI Init: hits are timestamped and sounded on the input thread
+        self.recorder = None
+        if replay is not None:
+            self.midi_input = ReplayInput(replay, self.GM_MIDI_MAP, self.clock.input_time_ms, on_hit=self._sound_manual_hit)
+        else:
+            self.midi_input = MidiInput(self.GM_MIDI_MAP, self.clock.input_time_ms, on_hit=self._sound_manual_hit)
+            if not headless:
+                self.midi_input.open()
+                if record_input:
+                    self._start_recorder()
+        self.midi_status = self.midi_input.status
+
+        # A-B practice loop, or None; see start_practice()
+        self.practice = None
+        self.loop_measures = loop_measures
+        self.practice_speed = practice_speed
+
+        # None unless tracing, so each trace point costs one truth test
+        self.tracer = Tracer() if trace_path else None
+        self.trace_path = trace_path
+
+        # Song time at which the BGM's get_pos() is zero
         self.time_base_ms = 0
-        self.start_ticks = 0
         self.clock_is_audio_driven = False
 
         self.game_state = {
@@ -84,55 +137,93 @@ class Game:
             "note_index": 0,
             "hit_animations": [],
             "notes_to_play": self.notes_to_play,
+            "judgement": self.judgement,
             "song_duration_ms": self.song_duration_ms,
-            "bgm_volume": self.audio_manager.bgm_volume,
-            "se_volume": self.audio_manager.se_volume,
+            "bgm_volume": self.audio_manager.bgm_volume if self.audio_manager else 0.0,
+            "se_volume": self.audio_manager.se_volume if self.audio_manager else 0.0,
             "auto_mode": self.auto_mode,
             "last_judgment": "",
             "midi_status": self.midi_status,
             "pressed_channels": set(),
+            "practice": "",
         }
 
     def run(self):
         """Starts the main playback loop."""
         self.audio_manager.load_sounds()
-        if not self.audio_manager.sounds and not self.audio_manager.bgm_path:
+        if not self.audio_manager.sounds and not self.audio_manager.bgm_path and not self.audio_manager.is_loading:
             logging.error("No sounds were loaded. Nothing to play.")
             return
 
-        clock = pygame.time.Clock()
+        try:
+            self.mixer_stream = MixerStream(self.audio_manager, self.notes_to_play)
+        except (ImportError, ValueError) as e:
+            logging.warning(f"Sample-accurate mixer unavailable ({e}); chips play on frame boundaries.")
+
+        frame_clock = pygame.time.Clock()
         logging.info("--- Starting Playback ---")
         
         self.time_base_ms = self.dtx.bgm_start_time_ms
         self.game_state["current_time_ms"] = self.time_base_ms
+        if self.mixer_stream:
+            self.mixer_stream.start(self.time_base_ms)
 
         self.clock_is_audio_driven = self.audio_manager.play_bgm()
-        self.start_ticks = pygame.time.get_ticks() - self.game_state["current_time_ms"]
+        self.clock.start(self.time_base_ms)
+        if self.loop_measures:
+            self.start_practice(*self.loop_measures)
 
+        tracer = self.tracer
         running = True
         while running:
-            current_tick = pygame.time.get_ticks()
+            if tracer:
+                frame_start = span_start = tracer.begin()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
                     running = False
+                if event.type == pygame.KEYDOWN and self.recorder:
+                    # Same time base as pad events, so a replay keeps them in order
+                    self.recorder.append(self.clock.input_time_ms(), event.key, 0, SOURCE_KEYBOARD)
                 self.handle_input(event)
             
             # Handle MIDI
             self.process_midi_input()
+            if isinstance(self.midi_input, ReplayInput):
+                while self.midi_input.keys:
+                    self.handle_input(pygame.event.Event(pygame.KEYDOWN, key=self.midi_input.keys.pop(0)))
+            if self.recorder:
+                self.recorder.flush()
+            self.game_state["load_progress"] = self.audio_manager.load_progress
+            if tracer:
+                tracer.end(SPAN_INPUT, span_start)
 
             # --- Update Master Clock ---
             if self.clock_is_audio_driven and pygame.mixer.music.get_busy():
-                self.game_state["current_time_ms"] = self.time_base_ms + pygame.mixer.music.get_pos()
-            else:
-                if self.clock_is_audio_driven:
-                    logging.info("BGM finished. Switching to system clock.")
-                    self.clock_is_audio_driven = False
-                    self.start_ticks = current_tick - self.game_state["current_time_ms"]
-                self.game_state["current_time_ms"] = current_tick - self.start_ticks
+                self.clock.sync(self.time_base_ms + pygame.mixer.music.get_pos())
+            elif self.clock_is_audio_driven:
+                logging.info("BGM finished. Master clock continues free-running.")
+                self.clock_is_audio_driven = False
+            if self.practice and self.clock.position_ms() >= self.practice.end_ms:
+                self._wrap_practice()
+            self.game_state["current_time_ms"] = self.clock.now()
 
-            self.update_notes()
-            
-            self.display_manager.draw_frame(self.game_state)
+            if self.mixer_stream and not self.practice:
+                if tracer:
+                    span_start = tracer.begin()
+                    self.mixer_stream.pump(self.clock.position_ms())
+                    tracer.end(SPAN_MIX, span_start)
+                else:
+                    self.mixer_stream.pump(self.clock.position_ms())
+            if tracer:
+                span_start = tracer.begin()
+                self.update_notes()
+                tracer.end(SPAN_UPDATE, span_start)
+                span_start = tracer.begin()
+                self.display_manager.draw_frame(self.game_state)
+                tracer.end(SPAN_DRAW, span_start)
+            else:
+                self.update_notes()
+                self.display_manager.draw_frame(self.game_state)
             
             # --- Check for end of song ---
             if self.game_state["note_index"] >= len(self.notes_to_play) and not pygame.mixer.music.get_busy():
@@ -140,113 +231,165 @@ class Game:
                 # Simple check for now
                 if self.game_state["current_time_ms"] > self.song_duration_ms:
                     logging.info("Playback finished.")
+                    self.save_results()
                     time.sleep(2)
                     running = False
             
-            clock.tick(240) # High loop rate for input precision
+            frame_clock.tick(240) # High loop rate for input precision
+            if tracer:
+                tracer.end(SPAN_FRAME, frame_start)
 
-        if self.midi_input:
-            self.midi_input.close()
+        self.midi_input.close()
+        if self.recorder:
+            self.recorder.close()
+        self.audio_manager.close()
         pygame.quit()
+        if tracer:
+            self.save_trace()
         logging.info("Player has shut down.")
 
+    def save_trace(self):
+        """Logs the traced frame statistics and writes the Chrome trace."""
+        self.tracer.log_summary()
+        try:
+            self.tracer.export_chrome_trace(self.trace_path)
+            logging.info(f"Saved trace '{self.trace_path}' ({self.tracer.size} events).")
+        except OSError as e:
+            logging.error(f"Could not save trace: {e}")
+
+    def _start_recorder(self):
+        path = session_log_path(self.dtx.dtx_path, extension=".dtxi")
+        try:
+            self.recorder = InputRecorder(path, self.dtx.dtx_path)
+        except OSError as e:
+            logging.error(f"Could not start input recording: {e}")
+            return
+        self.midi_input.recorder = self.recorder
+
+    def save_results(self):
+        """
+        Writes the finished play's lags: a DTXMania last-play ghost next to
+        the chart (live manual play only, never a replay) and a binary
+        session log.
+        """
+        chips = ghost_chips(self.notes_to_play)
+        lag = self.judgement.lag
+        lags = array("h", (lag[chip.index] for chip in chips))
+        counts = [self.judgement_counts[name] for name in self.JUDGEMENTS]
+        dtx_path = self.dtx.dtx_path
+        try:
+            if not self.auto_mode and not isinstance(self.midi_input, ReplayInput):
+                write_ghost(ghost_path_for(dtx_path), lags)
+            log_path = session_log_path(dtx_path)
+            write_session_log(log_path, dtx_path, chips, lags, counts, self.auto_mode)
+            logging.info(f"Saved session log '{log_path}'.")
+        except OSError as e:
+            logging.error(f"Could not save play results: {e}")
+
     def process_midi_input(self):
-        if not self.midi_input:
+        """Judges the pad events stamped by the MIDI thread since the last frame."""
+        pressed = self.game_state["pressed_channels"]
+        for kind, channel_id, time_ms, _ in self.midi_input.drain():
+            if kind == PAD_DOWN:
+                pressed.add(channel_id)
+                self.trigger_manual_note(channel_id, time_ms, play_sound=False)
+            else:
+                pressed.discard(channel_id)
+
+    def _find_hit_candidate(self, channel_id, hit_time_ms):
+        """
+        Returns (nearest unjudged chip the pad routes to, |lag| ms) within the
+        Poor window, or (None, None).
+        """
+        return self.lane_index.find(channel_id, hit_time_ms, self.POOR_MS * self.clock.speed)
+
+    def _sound_manual_hit(self, channel_id, hit_time_ms, velocity):
+        """
+        Plays the hit sound as soon as the pad is struck (MIDI thread).
+        Judgement follows on the main thread in trigger_manual_note.
+        """
+        if self.auto_mode:
             return
-        
-        # iter_pending is non-blocking
-        for msg in self.midi_input.iter_pending():
-            if msg.type == 'note_on' and msg.velocity > 0:
-                # Key Pressed
-                # logging.info(f"MIDI Note On: {msg.note} Vel: {msg.velocity}")
-                if msg.note in self.GM_MIDI_MAP:
-                    pk = self.GM_MIDI_MAP[msg.note]
-                    self.game_state["pressed_channels"].add(pk)
-                    self.trigger_manual_note(pk)
-                # else:
-                #     logging.info(f"Unmapped MIDI Note: {msg.note}")
-            
-            elif msg.type == 'note_off' or (msg.type == 'note_on' and msg.velocity == 0):
-                # Key Released
-                if msg.note in self.GM_MIDI_MAP:
-                    pk = self.GM_MIDI_MAP[msg.note]
-                    if pk in self.game_state["pressed_channels"]:
-                        self.game_state["pressed_channels"].remove(pk)
-
-    def trigger_manual_note(self, channel_id):
-        current_time = self.game_state["current_time_ms"]
-        
+        note, diff = self._find_hit_candidate(channel_id, hit_time_ms)
+        if note is not None:
+            self.audio_manager.play_note(note.channel, note.wav, hit_time_ms)
+            return
+        default_wav_id = self.dtx.channel_to_default_wav.get(channel_id)
+        if default_wav_id:
+            self.audio_manager.play_note(channel_id, default_wav_id, hit_time_ms)
+
+    def trigger_manual_note(self, channel_id, hit_time_ms=None, play_sound=True):
+        """
+        Judges a pad hit on a channel.
+
+        Args:
+            channel_id (str): The DTX channel of the pad.
+            hit_time_ms (float): When the pad was struck; defaults to the
+                current frame time.
+            play_sound (bool): False if the hit sound was already played on
+                arrival (see _sound_manual_hit).
+        """
+        current_time = self.game_state["current_time_ms"] if hit_time_ms is None else hit_time_ms
+
         if self.auto_mode:
              logging.info(f"Manual input on {channel_id} ignored (Auto Mode is ON)")
              # We could optionally trigger a 'ghost' sound here if desired
-             return 
+             return
 
-        # Judgment Window (ms)
-        PERFECT = 30
-        GREAT = 60
-        GOOD = 100
-        POOR = 150
-        
         # Find the best candidate note to hit
-        # We search primarily around the current note_index
-        # But for early hits, we might need to look ahead
-        # For late hits, we check unjudged notes behind?
-        
-        # Search window in notes list: simplistic
-        # Start a bit back
-        start_idx = max(0, self.game_state["note_index"] - 10)
-        end_idx = min(len(self.notes_to_play), self.game_state["note_index"] + 20)
-        
-        best_note = None
-        min_diff = 10000
-        
-        for i in range(start_idx, end_idx):
-            note = self.notes_to_play[i]
-            if note["channel"] == channel_id and not note["judged"]:
-                diff = abs(note["time"] - current_time)
-                if diff < min_diff:
-                    min_diff = diff
-                    best_note = note
-
-        if best_note and min_diff <= POOR:
-            # Hit!
-            best_note["hit"] = True
-            best_note["judged"] = True
-            
+        best_note, min_diff = self._find_hit_candidate(channel_id, current_time)
+
+        if best_note:
+            # Hit! Windows and lags are in real time, whatever the practice speed
+            speed = self.clock.speed
+            min_diff /= speed
             # Determine Judgment
             judgment = "MISS"
-            if min_diff <= PERFECT:
+            if min_diff <= self.PERFECT_MS:
                 judgment = "PERFECT"
-            elif min_diff <= GREAT:
+            elif min_diff <= self.GREAT_MS:
                 judgment = "GREAT"
-            elif min_diff <= GOOD:
+            elif min_diff <= self.GOOD_MS:
                 judgment = "GOOD"
             else:
                 judgment = "POOR"
-            
+
+            self.judgement.record(
+                best_note.index, (current_time - best_note.time) / speed, self.JUDGEMENTS.index(judgment)
+            )
             self.last_judgment = judgment
             self.game_state["last_judgment"] = judgment
-            
+            self.judgement_counts[judgment] += 1
+
             # Play Sound
-            self.audio_manager.play_note(best_note["channel"], best_note["wav"], current_time)
-            self.game_state["hit_animations"].append({"channel_id": channel_id, "time": current_time})
+            if play_sound and self.audio_manager:
+                self.audio_manager.play_note(best_note.channel, best_note.wav, current_time)
+            self.game_state["hit_animations"].append({"channel_id": best_note.channel, "time": self.game_state["current_time_ms"]})
             logging.info(f"Manual Hit! {judgment} ({max(0, min_diff):.2f}ms diff)")
-            
+
         else:
             # Ghost hit (pressed but no note near)
             default_wav_id = self.dtx.channel_to_default_wav.get(channel_id)
             if default_wav_id:
-                self.audio_manager.play_note(channel_id, default_wav_id, current_time)
-                self.game_state["hit_animations"].append({"channel_id": channel_id, "time": current_time})
+                if play_sound and self.audio_manager:
+                    self.audio_manager.play_note(channel_id, default_wav_id, current_time)
+                self.game_state["hit_animations"].append({"channel_id": channel_id, "time": self.game_state["current_time_ms"]})
                 logging.info(f"Manual ghost hit on channel {channel_id}")
 
     def update_notes(self):
         """Check for and trigger notes that are due."""
         current_time_ms = self.game_state["current_time_ms"]
         note_index = self.game_state["note_index"]
+        judged = self.judgement.judged
+        hit = self.judgement.hit
+        lag = self.judgement.lag
+        tracer = self.tracer
+        # Checked once per frame, so per-chip logging costs nothing when disabled
+        log_chips = logging.getLogger().isEnabledFor(logging.DEBUG)
         
         # We need to process notes that have passed
-        MISS_WINDOW = 150.0
+        MISS_WINDOW = 150.0 * self.clock.speed
+        MISS_RESULT = self.JUDGEMENTS.index("MISS")
 
         processed_count = 0
         
@@ -259,7 +402,7 @@ class Game:
         
         while note_index < len(self.notes_to_play):
             note = self.notes_to_play[note_index]
-            note_time = note["time"]
+            note_time = note.time
             
             # If the note is in the future beyond relevant timing, stop
             if note_time > current_time_ms + 10: # Small buffer
@@ -270,37 +413,47 @@ class Game:
             # 1. AUTO MODE or BGM Channel (Channels usually < 10 or specific?)
             # Actually DTX separates BGM (01) from playable.
             # But the user wants "Auto Mode" which plays DRUMS too.
-            playable_channels = set(self.GM_MIDI_MAP.values())
-            is_playable = note["channel"] in playable_channels
-            
-            should_auto_play = self.auto_mode or (not is_playable)
+            should_auto_play = self.auto_mode or (not note.is_playable)
             
             if should_auto_play:
-                if not note["judged"]:
+                if not judged[note_index]:
                      # Play it
-                     logging.info(f"Auto Trigger -> Time: {current_time_ms:.2f}ms, Sched: {note_time:.2f}ms, Chan: {note['channel']}")
-                     self.audio_manager.play_note(note["channel"], note["wav"], current_time_ms)
-                     self.game_state["hit_animations"].append({"channel_id": note["channel"], "time": current_time_ms})
-                     note["judged"] = True
-                     note["hit"] = True 
+                     if log_chips:
+                         logging.debug(f"Auto Trigger -> Time: {current_time_ms:.2f}ms, Sched: {note_time:.2f}ms, Chan: {note.channel}")
+                     # The mixer stream has already scheduled it at its exact offset
+                     # A practice loop has the chips mixed in already
+                     if self.audio_manager and not self.mixer_stream and not self.practice:
+                         if tracer:
+                             # Only here is the trigger as late as the frame that noticed it
+                             tracer.mark(MARK_LATENESS, current_time_ms - note_time)
+                             span_start = tracer.begin()
+                         self.audio_manager.play_note(note.channel, note.wav, current_time_ms)
+                         if tracer:
+                             tracer.end(SPAN_PLAY, span_start)
+                     self.game_state["hit_animations"].append({"channel_id": note.channel, "time": current_time_ms})
+                     judged[note_index] = 1
+                     hit[note_index] = 1
+                     lag[note_index] = 0
                 
                 # Advance index since we handled it
                 note_index += 1
 
             else:
                 # MANUAL MODE for Playable Note
-                if note["judged"]:
+                if judged[note_index]:
                     # Already hit manualy (or missed)
                     note_index += 1
                 else:
                     # Not judged yet.
                     # If time has passed MISS_WINDOW, it's a MISS.
                     if current_time_ms > note_time + MISS_WINDOW:
-                        note["judged"] = True
-                        note["hit"] = False # Visual miss (doesn't disappear? or maybe distinct visual)
+                        judged[note_index] = 1 # Visual miss: hit stays 0 so the chip keeps drawing
+                        self.judgement.result[note_index] = MISS_RESULT
                         self.last_judgment = "MISS"
                         self.game_state["last_judgment"] = "MISS"
-                        logging.info(f"Miss! Note passed.")
+                        self.judgement_counts["MISS"] += 1
+                        if log_chips:
+                            logging.debug(f"Miss! Note passed.")
                         note_index += 1
                     else:
                         # Still valid for hit. Do not increment index so we keep checking it?
@@ -311,22 +464,30 @@ class Game:
         self.game_state["note_index"] = note_index
 
     def handle_input(self, event):
-        """Handles user input for volume, seeking, etc."""
+        """
+        Handles user input for volume, seeking, etc.
+
+        A headless game has no audio or display, so only seeking and the
+        auto mode toggle apply to it.
+        """
         if event.type != pygame.KEYDOWN:
             return
 
         # Volume
-        if event.key == pygame.K_UP:
-            self.audio_manager.set_bgm_volume(min(1.0, self.audio_manager.bgm_volume + 0.1))
-        elif event.key == pygame.K_DOWN:
-            self.audio_manager.set_bgm_volume(max(0.0, self.audio_manager.bgm_volume - 0.1))
-        elif event.key == pygame.K_PAGEUP:
-            self.audio_manager.set_se_volume(min(1.0, self.audio_manager.se_volume + 0.1))
-        elif event.key == pygame.K_PAGEDOWN:
-            self.audio_manager.set_se_volume(max(0.0, self.audio_manager.se_volume - 0.1))
-        
-        self.game_state["bgm_volume"] = self.audio_manager.bgm_volume
-        self.game_state["se_volume"] = self.audio_manager.se_volume
+        if self.audio_manager:
+            if event.key == pygame.K_UP:
+                self.audio_manager.set_bgm_volume(min(1.0, self.audio_manager.bgm_volume + 0.1))
+            elif event.key == pygame.K_DOWN:
+                self.audio_manager.set_bgm_volume(max(0.0, self.audio_manager.bgm_volume - 0.1))
+            elif event.key == pygame.K_PAGEUP:
+                self.audio_manager.set_se_volume(min(1.0, self.audio_manager.se_volume + 0.1))
+            elif event.key == pygame.K_PAGEDOWN:
+                self.audio_manager.set_se_volume(max(0.0, self.audio_manager.se_volume - 0.1))
+
+            self.game_state["bgm_volume"] = self.audio_manager.bgm_volume
+            self.game_state["se_volume"] = self.audio_manager.se_volume
+            if self.practice and event.key in (pygame.K_UP, pygame.K_DOWN, pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+                self._restart_practice()  # The loop is rendered at the current volumes
 
         # Seeking
         current_time_ms = self.game_state["current_time_ms"]
@@ -336,44 +497,113 @@ class Game:
         elif event.key == pygame.K_LEFT:
             new_time_ms = current_time_ms - (self.JUMP_AMOUNT_S * 1000)
 
-        elif event.key == pygame.K_v:
+        elif event.key == pygame.K_v and self.display_manager:
             self.display_manager.toggle_layout()
             
         elif event.key == pygame.K_a:
             self.auto_mode = not self.auto_mode
             self.game_state["auto_mode"] = self.auto_mode
+            if self.mixer_stream:
+                self.mixer_stream.mixer.auto_mode = self.auto_mode
+            if self.practice:
+                self._restart_practice()
             logging.info(f"Auto Mode: {self.auto_mode}")
 
+        elif event.key == pygame.K_l and self.audio_manager:
+            if self.practice:
+                self.seek(current_time_ms)  # Leaves the loop
+            elif self.loop_measures:
+                self.start_practice(*self.loop_measures)
+            else:
+                measure = int(self.dtx.tempo_map().ms_to_measure(current_time_ms))
+                self.start_practice(measure, measure + 3)
+
+        elif event.key in (pygame.K_COMMA, pygame.K_PERIOD) and self.practice:
+            step = SPEED_STEP if event.key == pygame.K_PERIOD else -SPEED_STEP
+            self.practice_speed = round(self.practice.speed + step, 2)
+            self.start_practice(self.practice.first_measure, self.practice.last_measure)
+
         if new_time_ms != -1:
             self.seek(new_time_ms)
             
+    def start_practice(self, first_measure, last_measure):
+        """
+        Loops measures first_measure..last_measure at practice_speed.
+
+        The BGM stream and mixer stream stop; the section plays as one
+        pre-rendered, time-stretched Sound (see practice.SectionLoop) and the
+        clock runs at the practice speed, wrapping at the loop end.
+        """
+        try:
+            loop = SectionLoop(self.audio_manager, self.notes_to_play, first_measure, last_measure, self.practice_speed)
+        except (ImportError, ValueError) as e:
+            logging.error(f"Cannot start practice loop: {e}")
+            return
+        if loop.length_ms <= 0:
+            logging.error(f"Cannot loop measures {first_measure}-{last_measure}: the section is empty.")
+            return
+        pygame.mixer.music.stop()
+        self.clock_is_audio_driven = False
+        self.audio_manager.stop_all_sounds()
+        if self.mixer_stream:
+            self.mixer_stream.stop()
+        if self.practice:
+            self.practice.stop()
+        self.practice = loop
+        self.clock.set_speed(loop.speed)
+        self._restart_practice()
+        logging.info(
+            f"Practice loop: measures {first_measure}-{last_measure} "
+            f"({loop.start_ms / 1000:.2f}s-{loop.end_ms / 1000:.2f}s) at {loop.speed:.0%}."
+        )
+
+    def _restart_practice(self):
+        """(Re)starts the practice loop from its first measure, rendering it if needed."""
+        loop = self.practice
+        loop.play(self.auto_mode)
+        self.clock.start(loop.start_ms)
+        self.game_state["current_time_ms"] = loop.start_ms
+        self._seek_judgement(loop.start_ms)
+        self.game_state["hit_animations"].clear()
+        self.game_state["practice"] = f"Loop: m{loop.first_measure}-{loop.last_measure} @ {loop.speed:.0%}"
+
+    def _wrap_practice(self):
+        """Follows the looping Sound back to the loop start, keeping the overshoot."""
+        loop = self.practice
+        overshoot = (self.clock.position_ms() - loop.end_ms) % loop.length_ms
+        self.clock.start(loop.start_ms + overshoot)
+        self._seek_judgement(loop.start_ms)
+
+    def _seek_judgement(self, time_ms):
+        """Resets judgement state for play from time_ms and recounts the totals from what is left."""
+        self.game_state["note_index"] = self.judgement.seek(time_ms)
+        self.judgement_counts = dict(zip(self.JUDGEMENTS, self.judgement.counts(len(self.JUDGEMENTS))))
+
     def seek(self, new_time_ms):
-        """Seeks to a new time in the song."""
+        """Seeks to a new time in the song, leaving any practice loop."""
         logging.info(f"Seek event: Jumping to {new_time_ms/1000.0:.2f}s")
         new_time_ms = max(0, min(new_time_ms, self.song_duration_ms))
 
+        if self.practice:
+            self.practice.stop()
+            self.practice = None
+            self.clock.set_speed(1.0)
+            self.game_state["practice"] = ""
+
         self.game_state["current_time_ms"] = new_time_ms
         
         # Resync BGM
-        self.audio_manager.stop_bgm()
         music_start_pos_s = max(0, (new_time_ms - self.dtx.bgm_start_time_ms) / 1000.0)
 
-        # Update time bases for both clock types
         self.time_base_ms = new_time_ms
-        self.start_ticks = pygame.time.get_ticks() - new_time_ms
-        
-        self.clock_is_audio_driven = self.audio_manager.play_bgm(start_pos_s=music_start_pos_s)
-        
-        # Find new note index
-        self.game_state["note_index"] = 0
-        for i, note in enumerate(self.notes_to_play):
-            if note["time"] >= new_time_ms:
-                self.game_state["note_index"] = i
-                break
-            # Logic: If skipped, mark as handled? Or reset?
-            # Ideally reset state
-            note["judged"] = False
-            note["hit"] = False
-        
-        self.audio_manager.stop_all_sounds()
+        self.clock_is_audio_driven = bool(self.audio_manager) and self.audio_manager.restart_bgm(music_start_pos_s)
+        self.clock.start(new_time_ms)
+
+        # Chips before the new position count as passed, the rest as pending
+        self._seek_judgement(new_time_ms)
+
+        if self.audio_manager:
+            self.audio_manager.stop_all_sounds()
+        if self.mixer_stream:
+            self.mixer_stream.start(new_time_ms)
         self.game_state["hit_animations"].clear()
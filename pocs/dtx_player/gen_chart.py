@@ -0,0 +1,167 @@
+import sys
+import random
+import logging
+
+# Drum lanes filled by the generator (see Dtx.PART_CHANNELS).
+GEN_DRUM_CHANNELS = ("11", "12", "13", "14", "15", "16", "17", "18", "19", "1A", "1B", "1C")
+
+# Bar lengths used for odd measures (channel 02).
+GEN_BAR_LENGTHS = (0.25, 0.5, 0.75, 0.875, 1.125, 1.25, 1.5, 0.5625)
+
+# Output encodings. DTXMania writes UTF-16LE files with a BOM.
+ENCODINGS = {
+    "cp932": "cp932",
+    "utf-8": "utf-8",
+    "utf-16-le": "utf-16",
+}
+
+_BASE36 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def int_to_base36(n):
+    """Formats 0..1295 as a 2-character base36 ID (e.g. 36 -> '10')."""
+    return _BASE36[n // 36] + _BASE36[n % 36]
+
+
+def _object_line(measure, channel, slots):
+    """Formats one #MMMCC object line from a list of 2-char chip values."""
+    return f"#{measure:03d}{channel}: {''.join(slots)}"
+
+
+def generate_chart(
+    path,
+    measures=100,
+    density=16,
+    subdivision=192,
+    bpm_changes=0,
+    odd_bars=0.0,
+    wav_count=36,
+    encoding="cp932",
+    bpm=120.0,
+    seed=0,
+):
+    """
+    Writes a random but valid DTX file for stress-testing the parser.
+
+    Args:
+        path (str): Output file.
+        measures (int): Number of measures (at most 999, like DTXMania).
+        density (int): Drum chips per measure, spread over random lanes and
+            grid positions.
+        subdivision (int): Grid resolution per measure, e.g. 192 for 192nd notes.
+        bpm_changes (int): Number of BPM changes, alternating channel 03
+            (integer BPM in hex) and channel 08 (#BPMxx reference).
+        odd_bars (float): Fraction of measures given a non-1.0 bar length.
+        wav_count (int): Number of #WAVxx definitions the chips refer to.
+        encoding (str): One of ENCODINGS.
+        bpm (float): Base #BPM.
+        seed (int): Random seed; the same arguments always give the same file.
+
+    Returns:
+        dict: "lines" (text lines written), "chips" (non-empty chips, BPM
+        chips included) and "bytes" (file size).
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding '{encoding}'. Expected one of {sorted(ENCODINGS)}.")
+    measures = max(1, min(measures, 999))
+    wav_count = max(1, min(wav_count, 1295))
+    rng = random.Random(seed)
+
+    lines = [
+        "; Generated by gen_chart.py",
+        f"#TITLE: 合成譜面 {measures}m x{density} /{subdivision}",
+        "#ARTIST: ジェネレータ",
+        "#GENRE: Synthetic",
+        f"#BPM: {bpm:g}",
+        "#DLEVEL: 50",
+        "",
+    ]
+    for i in range(1, wav_count + 1):
+        lines.append(f"#WAV{int_to_base36(i)}: gen_{i:04d}.wav")
+        lines.append(f"#VOLUME{int_to_base36(i)}: {rng.randint(60, 100)}")
+
+    # Channel 08 BPM definitions, one per referenced change.
+    bpm_def_count = min((bpm_changes + 1) // 2, 1295)
+    for i in range(1, bpm_def_count + 1):
+        lines.append(f"#BPM{int_to_base36(i)}: {rng.uniform(60.0, 300.0):.3f}")
+    lines.append("")
+
+    chips = 0
+    object_lines = []
+
+    # BGM starts on the first beat.
+    object_lines.append(_object_line(1, "01", ["01"]))
+    chips += 1
+
+    for measure in rng.sample(range(measures), int(measures * odd_bars)):
+        object_lines.append(f"#{measure:03d}02: {rng.choice(GEN_BAR_LENGTHS)}")
+
+    # Spread the BPM changes over random (measure, position) slots.
+    per_measure_bpm = {}
+    for n in range(bpm_changes):
+        measure = rng.randrange(measures)
+        if n % 2 == 0:
+            channel, value = "03", f"{rng.randint(60, 255):02X}"
+        else:
+            channel, value = "08", int_to_base36(n // 2 % bpm_def_count + 1)
+        per_measure_bpm.setdefault((measure, channel), []).append(value)
+    for (measure, channel), values in sorted(per_measure_bpm.items()):
+        slots = ["00"] * subdivision
+        for value in values:
+            slots[rng.randrange(subdivision)] = value
+        object_lines.append(_object_line(measure, channel, slots))
+        chips += sum(1 for slot in slots if slot != "00")
+
+    for measure in range(measures):
+        grid = {}
+        for _ in range(density):
+            lane = rng.choice(GEN_DRUM_CHANNELS)
+            grid.setdefault(lane, set()).add(rng.randrange(subdivision))
+        for channel in sorted(grid):
+            slots = ["00"] * subdivision
+            for position in grid[channel]:
+                slots[position] = int_to_base36(rng.randint(1, wav_count))
+            object_lines.append(_object_line(measure, channel, slots))
+            chips += len(grid[channel])
+
+    lines.extend(object_lines)
+    text = "\r\n".join(lines) + "\r\n"
+    data = text.encode(ENCODINGS[encoding])
+    with open(path, "wb") as f:
+        f.write(data)
+
+    stats = {"lines": len(lines), "chips": chips, "bytes": len(data)}
+    logging.info(f"Generated '{path}': {stats['lines']} lines, {stats['chips']} chips, {stats['bytes']} bytes.")
+    return stats
+
+
+def main():
+    """Writes one synthetic chart from the command line."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)-7s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print(
+            "Usage: python gen_chart.py <output.dtx> [--measures=N] [--density=N] [--subdivision=N] "
+            "[--bpm-changes=N] [--odd-bars=F] [--encoding=cp932|utf-8|utf-16-le] [--seed=N]"
+        )
+        sys.exit(1)
+
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    generate_chart(
+        args[0],
+        measures=int(options.get("measures", 100)),
+        density=int(options.get("density", 16)),
+        subdivision=int(options.get("subdivision", 192)),
+        bpm_changes=int(options.get("bpm-changes", 0)),
+        odd_bars=float(options.get("odd-bars", 0.0)),
+        encoding=options.get("encoding", "cp932"),
+        seed=int(options.get("seed", 0)),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import struct
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# DTXMania ghost files (e.g. "mstr.dtx.lastplay.dr.ghost"): a little-endian
+# Int32 chip count, then one Int16 per chip of the part holding lag + 128,
+# with lag clamped to -128..127. Values above 255 mark a combo break (a
+# stray hit) just before the chip.
+GHOST_LAG_BIAS = 128
+GHOST_COMBO_BREAK = 256
+GHOST_MAX_LAG = 127
+
+# Binary session log: header, chart path, then one record per ghost chip as
+# parallel arrays (time float64 ms, channel uint8, lag int16), all
+# little-endian. See write_session_log.
+SESSION_MAGIC = b"DTXS"
+SESSION_VERSION = 1
+SESSION_HEADER = struct.Struct("<4sHHqI5IH")  # magic, version, flags, unix ms, chips, 5 counts, path length
+SESSION_AUTO = 1
+
+# Default session log location; override with the DTX_SESSION_DIR environment variable.
+DEFAULT_SESSION_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dtx_player", "sessions")
+
+# Chip channels recorded in a drum ghost.
+DRUM_GHOST_CHANNELS = frozenset({"11", "12", "13", "14", "15", "16", "17", "18", "19", "1A", "1B", "1C"})
+
+
+def ghost_chips(chips, channels=DRUM_GHOST_CHANNELS):
+    """Returns the chips a ghost stores a lag for, in chart order."""
+    return [chip for chip in chips if chip.channel in channels]
+
+
+def ghost_path_for(dtx_path, part="dr"):
+    """DTXMania's name for the last-play ghost of a chart, e.g. 'mstr.dtx.lastplay.dr.ghost'."""
+    return f"{dtx_path}.lastplay.{part}.ghost"
+
+
+def _little_endian(values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_ghost(path, lags, breaks=None):
+    """
+    Writes a DTXMania ghost file.
+
+    Args:
+        path (str): Destination.
+        lags (sequence): Lag per ghost chip in ms; clamped to -128..127, so
+            unhit chips (see chip.LAG_UNSET) are stored as Misses.
+        breaks (sequence): Optional combo-break flag per chip.
+    """
+    values = array("h", bytes(2 * len(lags)))
+    for i, lag in enumerate(lags):
+        value = max(-GHOST_LAG_BIAS, min(GHOST_MAX_LAG, lag)) + GHOST_LAG_BIAS
+        if breaks is not None and breaks[i]:
+            value += GHOST_COMBO_BREAK
+        values[i] = value
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<i", len(values)))
+        f.write(_little_endian(values))
+    os.replace(tmp_path, path)
+
+
+def read_ghost(path):
+    """
+    Reads a ghost file in one go.
+
+    Returns:
+        tuple: (lags, combo_breaks) as int16 and bool NumPy arrays.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If it is truncated.
+    """
+    if np is None:
+        raise ImportError("Reading ghosts requires NumPy.")
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < 4:
+        raise ValueError(f"Ghost '{os.path.basename(path)}' is truncated.")
+    (count,) = struct.unpack_from("<i", data)
+    if len(data) < 4 + 2 * count:
+        raise ValueError(f"Ghost '{os.path.basename(path)}' has {count} chips but only {(len(data) - 4) // 2} values.")
+    raw = np.frombuffer(data, dtype="<i2", count=count, offset=4)
+    breaks = raw >= GHOST_COMBO_BREAK
+    lags = ((raw & 0xFF) - GHOST_LAG_BIAS).astype(np.int16)
+    return lags, breaks
+
+
+def session_log_path(dtx_path, session_dir=None, extension=".dtxs"):
+    """A new, timestamped session log path for a chart (".dtxi" for input logs)."""
+    session_dir = session_dir or os.environ.get("DTX_SESSION_DIR") or DEFAULT_SESSION_DIR
+    song = os.path.basename(os.path.dirname(os.path.abspath(dtx_path)))
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(session_dir, f"{song}-{os.path.basename(dtx_path)}-{stamp}{extension}")
+
+
+def write_session_log(path, dtx_path, chips, lags, counts, auto_mode=False):
+    """
+    Writes a binary log of one play, loadable in a single read.
+
+    Args:
+        path (str): Destination; parent directories are created.
+        dtx_path (str): Chart that was played.
+        chips (list): Ghost chips (see ghost_chips).
+        lags (sequence): Lag per chip in ms, as in JudgementState.lag.
+        counts (sequence): Perfect, Great, Good, Poor and Miss counts.
+        auto_mode (bool): Whether the play was automatic.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    chart = os.path.abspath(dtx_path).encode("utf-8")
+    header = SESSION_HEADER.pack(
+        SESSION_MAGIC,
+        SESSION_VERSION,
+        SESSION_AUTO if auto_mode else 0,
+        int(time.time() * 1000),
+        len(chips),
+        *counts,
+        len(chart),
+    )
+    times = array("d", (chip.time for chip in chips))
+    channels = bytes(chip.channel_id & 0xFF for chip in chips)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(chart)
+        f.write(_little_endian(times))
+        f.write(channels)
+        f.write(_little_endian(array("h", lags)))
+    os.replace(tmp_path, path)
+
+
+def read_session_log(path):
+    """
+    Reads a session log written by write_session_log.
+
+    Returns:
+        dict: "chart", "auto_mode", "unix_ms", "counts", and NumPy arrays
+        "times", "channels" and "lags".
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If it is not a session log or is truncated.
+    """
+    if np is None:
+        raise ImportError("Reading session logs requires NumPy.")
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < SESSION_HEADER.size:
+        raise ValueError(f"Session log '{os.path.basename(path)}' is truncated.")
+    magic, version, flags, unix_ms, count, *rest = SESSION_HEADER.unpack_from(data)
+    counts, path_length = rest[:5], rest[5]
+    if magic != SESSION_MAGIC or version != SESSION_VERSION:
+        raise ValueError(f"'{os.path.basename(path)}' is not a version {SESSION_VERSION} session log.")
+    offset = SESSION_HEADER.size + path_length
+    if len(data) < offset + count * 11:
+        raise ValueError(f"Session log '{os.path.basename(path)}' is truncated.")
+    chart = data[SESSION_HEADER.size:offset].decode("utf-8")
+    times = np.frombuffer(data, dtype="<f8", count=count, offset=offset)
+    channels = np.frombuffer(data, dtype=np.uint8, count=count, offset=offset + 8 * count)
+    lags = np.frombuffer(data, dtype="<i2", count=count, offset=offset + 9 * count)
+    return {
+        "chart": chart,
+        "auto_mode": bool(flags & SESSION_AUTO),
+        "unix_ms": unix_ms,
+        "counts": tuple(counts),
+        "times": times,
+        "channels": channels,
+        "lags": lags,
+    }
@@ -0,0 +1,170 @@
+import os
+import struct
+import logging
+import threading
+from midi_input import PAD_DOWN, SOURCE_KEYBOARD
+
+# Input logs (.dtxi): a header with the chart path, then fixed-width
+# little-endian records of every raw input event, in arrival order.
+INPUT_LOG_MAGIC = b"DTXI"
+INPUT_LOG_VERSION = 1
+INPUT_LOG_HEADER = struct.Struct("<4sHHH")  # magic, version, record size, chart path length
+# time_ms (song time the event was stamped with), code (MIDI note or pygame
+# key), velocity, source, kind (PAD_DOWN/PAD_UP), padding
+INPUT_RECORD = struct.Struct("<dIBBBx")
+
+# Records held in memory before the main thread writes them out.
+RECORDER_CAPACITY = 4096
+
+
+class InputRecorder:
+    """
+    Ring-buffered recorder of raw input events.
+
+    append() packs one fixed-width record into a preallocated bytearray. It
+    is called from two threads, the MIDI callback and the main loop
+    (keyboard events), so claiming and filling a slot happens under a short
+    lock. That lock is never held across file I/O. flush() runs on the main
+    thread and owns the flushed counter; it only writes once the ring is
+    half full (or when forced), keeping file I/O out of most frames. If the
+    ring ever fills, new events are dropped and counted rather than
+    overwriting unwritten ones.
+    """
+
+    def __init__(self, path, chart_path, capacity=RECORDER_CAPACITY):
+        """
+        Args:
+            path (str): Log file to create; parent directories are created.
+            chart_path (str): Chart being played, stored in the header.
+            capacity (int): Records held in memory.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.capacity = capacity
+        self._ring = bytearray(capacity * INPUT_RECORD.size)
+        self._view = memoryview(self._ring)
+        self._written = 0  # Records appended (producer)
+        self._flushed = 0  # Records written to the file (consumer)
+        self._append_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.dropped = 0
+        chart = os.path.abspath(chart_path).encode("utf-8")
+        self._file = open(path, "wb")
+        self._file.write(INPUT_LOG_HEADER.pack(INPUT_LOG_MAGIC, INPUT_LOG_VERSION, INPUT_RECORD.size, len(chart)))
+        self._file.write(chart)
+
+    def append(self, time_ms, code, velocity, source, kind=PAD_DOWN):
+        """Buffers one event; time_ms must come from the game's input clock (MasterClock.input_time_ms)."""
+        with self._append_lock:
+            written = self._written
+            if written - self._flushed >= self.capacity:
+                self.dropped += 1
+                return
+            INPUT_RECORD.pack_into(
+                self._ring, (written % self.capacity) * INPUT_RECORD.size, time_ms, code, velocity, source, kind
+            )
+            self._written = written + 1
+
+    def flush(self, force=False):
+        """Writes buffered records to the file; by default only once the ring is half full."""
+        with self._flush_lock:
+            if self._file is None:
+                return
+            end = self._written
+            if not force and end - self._flushed < self.capacity // 2:
+                return
+            size = INPUT_RECORD.size
+            while self._flushed < end:
+                start = self._flushed % self.capacity
+                count = min(end - self._flushed, self.capacity - start)
+                self._file.write(self._view[start * size : (start + count) * size])
+                self._flushed += count
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush(force=True)
+        with self._flush_lock:
+            self._file.close()
+            self._file = None
+        if self.dropped:
+            logging.warning(f"Input recorder dropped {self.dropped} events; the ring buffer was full.")
+        logging.info(f"Saved input log '{self.path}' ({self._flushed} events).")
+
+
+def read_input_log(path):
+    """
+    Reads an input log.
+
+    Returns:
+        tuple: (chart path, list of (time_ms, code, velocity, source, kind)).
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If it is not an input log.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < INPUT_LOG_HEADER.size:
+        raise ValueError(f"Input log '{os.path.basename(path)}' is truncated.")
+    magic, version, record_size, path_length = INPUT_LOG_HEADER.unpack_from(data)
+    if magic != INPUT_LOG_MAGIC or version != INPUT_LOG_VERSION or record_size != INPUT_RECORD.size:
+        raise ValueError(f"'{os.path.basename(path)}' is not a version {INPUT_LOG_VERSION} input log.")
+    offset = INPUT_LOG_HEADER.size + path_length
+    chart = data[INPUT_LOG_HEADER.size:offset].decode("utf-8")
+    # A log cut short by a crash may end in a partial record; ignore it.
+    end = offset + (len(data) - offset) // record_size * record_size
+    return chart, list(INPUT_RECORD.iter_unpack(data[offset:end]))
+
+
+class ReplayInput:
+    """
+    Feeds a recorded input log back in place of MidiInput.
+
+    Events are released in their recorded order once the clock reaches
+    their time, and pad events keep their recorded timestamps, so
+    judgements come out exactly as recorded however the frames fall.
+    Keyboard events are queued in keys for the game loop to handle; a
+    release stops after each one, since a replayed seek moves the clock
+    that the following events were recorded against.
+    """
+
+    def __init__(self, records, note_map, clock, on_hit=None):
+        """
+        Args:
+            records (list): As returned by read_input_log.
+            note_map (dict): MIDI note number -> DTX channel.
+            clock (callable): Returns the current song time in ms.
+            on_hit (callable): on_hit(channel, time_ms, velocity) for each
+                pad press, as with MidiInput.
+        """
+        self.records = records
+        self.note_map = note_map
+        self.clock = clock
+        self.on_hit = on_hit
+        self.keys = []
+        self._next = 0
+        self.status = f"Replay: {len(records)} events"
+
+    def open(self):
+        return True
+
+    def drain(self):
+        """Yields (kind, channel, time_ms, velocity) for pad events now due."""
+        now = self.clock()
+        records = self.records
+        while self._next < len(records) and records[self._next][0] <= now:
+            time_ms, code, velocity, source, kind = records[self._next]
+            self._next += 1
+            if source == SOURCE_KEYBOARD:
+                self.keys.append(code)
+                return
+            channel = self.note_map.get(code)
+            if channel is None:
+                continue
+            if kind == PAD_DOWN and self.on_hit:
+                self.on_hit(channel, time_ms, velocity)
+            yield kind, channel, time_ms, velocity
+
+    def close(self):
+        pass
@@ -0,0 +1,131 @@
+from bisect import bisect_left
+
+# Lanes each pad always hits, in preference order (see notes/04). Both
+# pedals can take left bass drum chips, which have no pad of their own.
+PAD_LANES = {
+    "11": ("11",),  # HH close
+    "18": ("18",),  # HH open
+    "1A": ("1A",),  # Left cymbal
+    "12": ("12",),  # Snare
+    "14": ("14",),  # High tom
+    "15": ("15",),  # Low tom
+    "17": ("17",),  # Floor tom
+    "16": ("16",),  # Cymbal
+    "19": ("19",),  # Ride
+    "13": ("13", "1C"),  # Bass drum
+    "1B": ("1B", "1C"),  # Left pedal
+    "1C": ("1C", "13", "1B"),  # Left bass drum
+}
+
+# Lanes a pad switches to when the chart has no chips on its own lane:
+# HHO and LC fall back to HH, RD falls back to CY.
+PAD_FALLBACKS = {
+    "18": ("11",),
+    "1A": ("11",),
+    "19": ("16",),
+}
+
+# Pads merged when a group is set to "common" (DTXMania HHGroup/FTGroup/CYGroup).
+PAD_GROUPS = {
+    "hh": ("11", "18"),
+    "ft": ("15", "17"),
+    "cy": ("16", "19"),
+}
+
+
+def build_routes(lanes_present, common_groups=()):
+    """
+    Precomputes the candidate lanes for every pad.
+
+    Args:
+        lanes_present (set): Channels that have at least one chip.
+        common_groups (iterable): Names from PAD_GROUPS whose pads hit each
+            other's lanes.
+
+    Returns:
+        dict: Pad channel -> tuple of lanes, most preferred first.
+    """
+    routes = {}
+    for pad, lanes in PAD_LANES.items():
+        route = list(lanes)
+        for group in common_groups:
+            members = PAD_GROUPS[group]
+            if pad in members:
+                route.extend(lane for lane in members if lane not in route)
+        if pad not in lanes_present:
+            route.extend(lane for lane in PAD_FALLBACKS.get(pad, ()) if lane not in route)
+        routes[pad] = tuple(lane for lane in route if lane in lanes_present)
+    return routes
+
+
+class LaneIndex:
+    """
+    Per-lane sorted chip times for judging pad hits in O(log n).
+
+    Each playable lane keeps its chips and their times in parallel lists.
+    A hit bisects the times of every lane its pad routes to, then walks
+    outwards past already-judged chips, stopping at the judgement window, so
+    the cost does not depend on how dense the chart is.
+    """
+
+    def __init__(self, chips, judged, common_groups=()):
+        """
+        Args:
+            chips (list): Chip objects sorted by time.
+            judged (bytearray): JudgementState.judged for the same chips.
+            common_groups (iterable): See build_routes.
+        """
+        self.judged = judged
+        self._chips = {}
+        self._times = {}
+        for chip in chips:
+            if chip.is_playable:
+                self._chips.setdefault(chip.channel, []).append(chip)
+        for lane, lane_chips in self._chips.items():
+            self._times[lane] = [chip.time for chip in lane_chips]
+        self.routes = build_routes(set(self._chips), common_groups)
+
+    def _nearest_unjudged(self, lane, time_ms, window_ms):
+        times = self._times[lane]
+        chips = self._chips[lane]
+        judged = self.judged
+        i = bisect_left(times, time_ms)
+        best = None
+        best_diff = None
+        # Later chips
+        j = i
+        while j < len(times) and times[j] - time_ms <= window_ms:
+            if not judged[chips[j].index]:
+                best, best_diff = chips[j], times[j] - time_ms
+                break
+            j += 1
+        # Earlier chips
+        j = i - 1
+        while j >= 0 and time_ms - times[j] <= window_ms:
+            if not judged[chips[j].index]:
+                if best is None or time_ms - times[j] < best_diff:
+                    best, best_diff = chips[j], time_ms - times[j]
+                break
+            j -= 1
+        return best, best_diff
+
+    def find(self, pad, time_ms, window_ms):
+        """
+        Finds the chip a pad hit should judge.
+
+        Args:
+            pad (str): Channel of the pad that was struck.
+            time_ms (float): Hit time.
+            window_ms (float): Largest |lag| that still counts as a hit.
+
+        Returns:
+            tuple: (chip, |lag| ms), or (None, None) if no unjudged chip on the
+            pad's lanes is within the window. Ties go to the preferred lane.
+        """
+        best = None
+        best_diff = None
+        for lane in self.routes.get(pad, ()):
+            chip, diff = self._nearest_unjudged(lane, time_ms, window_ms)
+            if chip is not None and (best is None or diff < best_diff):
+                best, best_diff = chip, diff
+        return best, best_diff
@@ -0,0 +1,285 @@
+import os
+import sys
+import time
+import sqlite3
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dtx import Dtx
+from setdef import SetDef
+
+# Chart extensions understood by the indexer (lower-case).
+CHART_EXTENSIONS = (".dtx",)
+
+# Default database file name, created in the library root.
+DEFAULT_DB_NAME = "dtx_library.sqlite3"
+
+# Drum lanes 0x11-0x1C, counted separately from BGM and SE chips.
+DRUM_CHANNELS = {"11", "12", "13", "14", "15", "16", "17", "18", "19", "1A", "1B", "1C"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS charts (
+    path TEXT PRIMARY KEY,
+    song_dir TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    title TEXT,
+    artist TEXT,
+    genre TEXT,
+    dlevel INTEGER,
+    glevel INTEGER,
+    blevel INTEGER,
+    bpm REAL,
+    bpm_min REAL,
+    bpm_max REAL,
+    note_count INTEGER,
+    drum_note_count INTEGER,
+    duration_ms REAL,
+    preview_path TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS charts_song_dir ON charts (song_dir);
+CREATE TABLE IF NOT EXISTS set_defs (
+    path TEXT PRIMARY KEY,
+    song_dir TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS set_charts (
+    set_path TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    title TEXT,
+    font_color TEXT,
+    slot INTEGER NOT NULL,
+    label TEXT,
+    chart_path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS set_charts_set_path ON set_charts (set_path);
+"""
+
+_CHART_COLUMNS = (
+    "path", "song_dir", "size", "mtime_ns", "title", "artist", "genre",
+    "dlevel", "glevel", "blevel", "bpm", "bpm_min", "bpm_max",
+    "note_count", "drum_note_count", "duration_ms", "preview_path", "error",
+)
+
+
+def _init_worker():
+    """Keeps per-chart parse logging out of the indexer's output."""
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def index_chart(path, size, mtime_ns, header_only=False):
+    """
+    Parses one chart and summarizes it as a row for the charts table.
+    Runs in a worker process, so it only returns plain values.
+
+    With header_only, only header commands are read, so the columns that
+    need the timeline (BPM range, note counts, duration) stay NULL.
+
+    Returns:
+        dict: Column name -> value. Parse failures are recorded in "error".
+    """
+    row = dict.fromkeys(_CHART_COLUMNS)
+    row.update(path=path, song_dir=os.path.dirname(path), size=size, mtime_ns=mtime_ns)
+    try:
+        dtx = Dtx(path)
+        dtx.parse(mode="header" if header_only else "full")
+    except Exception as e:
+        row["error"] = str(e)
+        return row
+
+    bpms = [bpm for bpm in [dtx.bpm] + [bpm for _, bpm in dtx.bpm_events] if bpm > 0]
+    row.update(
+        title=dtx.title,
+        artist=dtx.artist,
+        genre=dtx.genre,
+        dlevel=dtx.levels.get("DLEVEL"),
+        glevel=dtx.levels.get("GLEVEL"),
+        blevel=dtx.levels.get("BLEVEL"),
+        bpm=dtx.bpm,
+        bpm_min=min(bpms, default=None),
+        bpm_max=max(bpms, default=None),
+        note_count=len(dtx.timed_notes),
+        drum_note_count=sum(1 for _, channel, _ in dtx.timed_notes if channel in DRUM_CHANNELS),
+        duration_ms=dtx.timed_notes[-1][0] if dtx.timed_notes else 0.0,
+        preview_path=dtx.preview_path,
+    )
+    if header_only:
+        row.update(bpm_min=None, bpm_max=None, note_count=None, drum_note_count=None, duration_ms=None)
+    return row
+
+
+class LibraryIndex:
+    """
+    Maintains a SQLite index of every chart and set.def under a library root.
+
+    scan() walks the tree, re-parses only files whose size or mtime changed
+    since the last scan (charts in a process pool), and drops rows for files
+    that no longer exist.
+    """
+
+    def __init__(self, root, db_path=None, workers=None, header_only=False):
+        """
+        Args:
+            root (str): Library root, e.g. a folder laid out like examples/dtx.
+            db_path (str): SQLite file; defaults to DEFAULT_DB_NAME in root.
+            workers (int): Process pool size; defaults to os.cpu_count().
+            header_only (bool): Index from chart headers only (see index_chart).
+        """
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or os.path.join(self.root, DEFAULT_DB_NAME)
+        self.workers = workers
+        self.header_only = header_only
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _walk(self):
+        """Returns ({chart_path: (size, mtime_ns)}, {set_def_path: (size, mtime_ns)})."""
+        charts, set_defs = {}, {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                lower = name.lower()
+                if lower.endswith(CHART_EXTENSIONS):
+                    target = charts
+                elif lower == "set.def":
+                    target = set_defs
+                else:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                target[path] = (st.st_size, st.st_mtime_ns)
+        return charts, set_defs
+
+    def _stale(self, table, found):
+        """Splits found files into (changed or new, removed) against the table."""
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self.conn.execute(f"SELECT path, size, mtime_ns FROM {table}")
+        }
+        changed = [path for path, stat in found.items() if known.get(path) != stat]
+        removed = [path for path in known if path not in found]
+        return changed, removed
+
+    def scan(self):
+        """
+        Brings the index up to date with the files under the root.
+
+        Returns:
+            dict: Counts of "charts", "parsed", "removed" and "set_defs", plus
+            "elapsed_s".
+        """
+        start = time.perf_counter()
+        charts, set_defs = self._walk()
+        changed_charts, removed_charts = self._stale("charts", charts)
+        changed_sets, removed_sets = self._stale("set_defs", set_defs)
+
+        rows = []
+        if len(changed_charts) > 1 and self.workers != 1:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+                jobs = [(path, *charts[path], self.header_only) for path in changed_charts]
+                rows = list(pool.map(index_chart, *zip(*jobs), chunksize=16))
+        else:
+            rows = [index_chart(path, *charts[path], self.header_only) for path in changed_charts]
+
+        placeholders = ", ".join("?" for _ in _CHART_COLUMNS)
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM charts WHERE path = ?", [(path,) for path in removed_charts]
+            )
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO charts ({', '.join(_CHART_COLUMNS)}) VALUES ({placeholders})",
+                [tuple(row[column] for column in _CHART_COLUMNS) for row in rows],
+            )
+            for path in removed_sets + changed_sets:
+                self.conn.execute("DELETE FROM set_defs WHERE path = ?", (path,))
+                self.conn.execute("DELETE FROM set_charts WHERE set_path = ?", (path,))
+            for path in changed_sets:
+                self._index_set_def(path, *set_defs[path])
+
+        for row in rows:
+            if row["error"]:
+                logging.warning(f"Could not index '{row['path']}': {row['error']}")
+
+        stats = {
+            "charts": len(charts),
+            "parsed": len(rows),
+            "removed": len(removed_charts),
+            "set_defs": len(set_defs),
+            "elapsed_s": time.perf_counter() - start,
+        }
+        logging.info(
+            f"Library scan: {stats['charts']} charts ({stats['parsed']} parsed, "
+            f"{stats['removed']} removed), {stats['set_defs']} set.def files in {stats['elapsed_s']:.2f}s."
+        )
+        return stats
+
+    def _index_set_def(self, path, size, mtime_ns):
+        try:
+            set_def = SetDef(path)
+            set_def.parse()
+        except Exception as e:
+            logging.warning(f"Could not parse set.def '{path}': {e}")
+            return
+        self.conn.execute(
+            "INSERT INTO set_defs (path, song_dir, size, mtime_ns) VALUES (?, ?, ?, ?)",
+            (path, os.path.dirname(path), size, mtime_ns),
+        )
+        self.conn.executemany(
+            "INSERT INTO set_charts (set_path, block, title, font_color, slot, label, chart_path) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (path, i, block["title"], block["font_color"], slot, label, chart_path)
+                for i, block in enumerate(set_def.blocks)
+                for slot, label, chart_path in block["charts"]
+            ],
+        )
+
+    def search(self, text=""):
+        """Returns chart rows (as dicts) whose title or artist contains text."""
+        pattern = f"%{text}%"
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(_CHART_COLUMNS)} FROM charts "
+            "WHERE error IS NULL AND (title LIKE ? OR artist LIKE ?) ORDER BY title, dlevel",
+            (pattern, pattern),
+        )
+        return [dict(zip(_CHART_COLUMNS, row)) for row in cursor]
+
+
+def main():
+    """Indexes a library root from the command line and lists its charts."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)-7s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    if len(sys.argv) < 2:
+        print("Usage: python library.py <library_root> [db_path] [--headers-only]")
+        sys.exit(1)
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    index = LibraryIndex(
+        args[0],
+        db_path=args[1] if len(args) > 1 else None,
+        header_only="--headers-only" in sys.argv,
+    )
+    try:
+        index.scan()
+        for row in index.search():
+            print(
+                f"{row['title']} / {row['artist']}  DLV {row['dlevel']}  "
+                f"BPM {row['bpm_min'] or row['bpm']:.0f}-{row['bpm_max'] or row['bpm']:.0f}  "
+                f"{row['drum_note_count'] or '-'} notes  "
+                f"{os.path.relpath(row['path'], index.root)}"
+            )
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,68 @@
 import sys
 import logging
 import traceback
-from dtx import Dtx
+from chart_cache import load_chart
 from gameplay import Game
+from voices import load_choke_groups
+from input_log import read_input_log
+from ghost import session_log_path
 
 
 def main():
     """Main function to run the DTX player from the command line."""
     logging.basicConfig(
-        level=logging.INFO,
+        level=logging.DEBUG if "--verbose" in sys.argv else logging.INFO,
         format='%(asctime)s [%(levelname)-7s] %(message)s',
         datefmt='%H:%M:%S'
     )
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <path_to_dtx_file>")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    if not args and "replay" not in options:
+        print(
+            "Usage: python main.py <path_to_dtx_file> [--no-cache] [--choke-groups=config.json] "
+            "[--audio-latency=ms] [--input-adjust=ms] [--no-record] [--loop=N-M] [--speed=0.5-1.0]\n"
+            "       [--trace[=trace.json]] [--verbose]\n"
+            "       python main.py --replay=input.dtxi [path_to_dtx_file]"
+        )
         sys.exit(1)
 
-    dtx_file_path = sys.argv[1]
+    use_cache = "--no-cache" not in sys.argv
 
     try:
-        dtx_data = Dtx(dtx_file_path)
-        dtx_data.parse()
+        replay = None
+        if "replay" in options:
+            recorded_chart, replay = read_input_log(options["replay"])
+            dtx_file_path = args[0] if args else recorded_chart
+        else:
+            dtx_file_path = args[0]
 
-        game = Game(dtx_data)
+        choke_groups = None
+        if "choke-groups" in options:
+            choke_groups = load_choke_groups(options["choke-groups"])
+
+        loop_measures = None
+        if "loop" in options:
+            first, _, last = options["loop"].partition("-")
+            loop_measures = (int(first), int(last or first))
+
+        trace_path = options.get("trace")
+        if "--trace" in sys.argv:
+            trace_path = session_log_path(dtx_file_path, extension=".trace.json")
+
+        dtx_data = load_chart(dtx_file_path, use_cache=use_cache)
+
+        game = Game(
+            dtx_data,
+            use_cache=use_cache,
+            choke_groups=choke_groups,
+            audio_latency_ms=float(options.get("audio-latency", 0)),
+            input_adjust_ms=float(options.get("input-adjust", 0)),
+            record_input="--no-record" not in sys.argv,
+            replay=replay,
+            loop_measures=loop_measures,
+            practice_speed=float(options.get("speed", 1.0)),
+            trace_path=trace_path,
+        )
         game.run()
 
     except Exception as e:
@@ -0,0 +1,107 @@
+import threading
+import time
+
+
+class MasterClock:
+    """
+    The song clock everything reads: judgement, scrolling and chip scheduling.
+
+    Time runs on time.perf_counter_ns, so it is smooth at any frame rate and
+    readable from any thread. While the BGM plays, sync() disciplines it
+    against the music position with a small PI loop instead of copying that
+    position: pygame.mixer.music.get_pos() advances in buffer-sized steps, so
+    each reading only nudges the clock (the proportional part) and slowly
+    trims its rate to the sound card's (the integral part). Large errors,
+    e.g. after the BGM stalls, are snapped to. When the BGM stops the clock
+    simply keeps running, so there is no jump at the end of the song.
+
+    Two offsets follow DTXMania's configuration:
+
+    - audio_latency_ms: how long audio takes to be heard after it is mixed.
+      position_ms() is the mixing position; now() is the heard position,
+      this much earlier, and is what the chart is displayed and judged at.
+    - input_adjust_ms: like nInputAdjustTimeMs, added to every input
+      timestamp (see input_time_ms) to cancel out pad and driver latency.
+
+    speed scales how fast song time runs against real time, for practice at
+    a reduced tempo (see set_speed).
+    """
+
+    # Fraction of the measured error corrected per sync() call.
+    PHASE_GAIN = 0.02
+    # Rate change per ms of error, and the largest rate correction allowed.
+    RATE_GAIN = 0.0000005
+    MAX_RATE_ERROR = 0.005
+    # Errors above this are resynced at once rather than slewed.
+    SNAP_MS = 120.0
+
+    def __init__(self, audio_latency_ms=0.0, input_adjust_ms=0.0):
+        self.audio_latency_ms = audio_latency_ms
+        self.input_adjust_ms = input_adjust_ms
+        self._lock = threading.Lock()
+        self._rate = 1.0
+        self.speed = 1.0
+        # (perf_counter_ns, song ms, rate): replaced as a whole so readers on
+        # other threads never see a half-updated anchor.
+        self._anchor = (time.perf_counter_ns(), 0.0, 1.0)
+        self._last_ms = 0.0
+        self.snaps = 0
+
+    def _position_at(self, now_ns):
+        anchor_ns, anchor_ms, rate = self._anchor
+        return anchor_ms + (now_ns - anchor_ns) * rate / 1_000_000
+
+    def start(self, time_ms):
+        """Sets the song position, e.g. at start or after a seek. May go backwards."""
+        with self._lock:
+            self._anchor = (time.perf_counter_ns(), time_ms, self._rate * self.speed)
+            self._last_ms = time_ms - self.audio_latency_ms * self.speed
+
+    def set_speed(self, speed):
+        """Changes how fast song time runs, continuing from the current position."""
+        with self._lock:
+            now_ns = time.perf_counter_ns()
+            position = self._position_at(now_ns)
+            self.speed = speed
+            self._anchor = (now_ns, position, self._rate * speed)
+
+    def sync(self, audio_position_ms):
+        """
+        Disciplines the clock against the position reported by the audio device.
+
+        Returns:
+            float: The error before correction (audio minus clock) in ms.
+        """
+        with self._lock:
+            now_ns = time.perf_counter_ns()
+            position = self._position_at(now_ns)
+            error = audio_position_ms - position
+            if abs(error) > self.SNAP_MS:
+                self.snaps += 1
+                self._anchor = (now_ns, audio_position_ms, self._rate * self.speed)
+                return error
+            self._rate = min(
+                1.0 + self.MAX_RATE_ERROR,
+                max(1.0 - self.MAX_RATE_ERROR, self._rate + error * self.RATE_GAIN),
+            )
+            self._anchor = (now_ns, position + error * self.PHASE_GAIN, self._rate * self.speed)
+            return error
+
+    def position_ms(self):
+        """Song time being mixed now. Use it to schedule audio."""
+        return self._position_at(time.perf_counter_ns())
+
+    def now(self):
+        """
+        Song time being heard now; never decreases between start() calls.
+        Safe from any thread.
+        """
+        heard = self._position_at(time.perf_counter_ns()) - self.audio_latency_ms * self.speed
+        if heard < self._last_ms:
+            return self._last_ms
+        self._last_ms = heard
+        return heard
+
+    def input_time_ms(self):
+        """Song time to stamp an input event with, including input_adjust_ms."""
+        return self.now() + self.input_adjust_ms
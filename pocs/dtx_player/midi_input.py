@@ -0,0 +1,106 @@
+import logging
+from collections import deque
+
+try:
+    import mido
+except ImportError:
+    mido = None
+
+# Event kinds pushed by MidiInput.
+PAD_DOWN = 0
+PAD_UP = 1
+
+# Input sources, as stored by input_log.InputRecorder.
+SOURCE_MIDI = 0
+SOURCE_KEYBOARD = 1
+
+
+def pick_input_port(names):
+    """Prefers the first port that is not a MIDI Through port."""
+    for name in names:
+        if "Through" not in name:
+            return name
+    return names[0] if names else None
+
+
+class MidiInput:
+    """
+    Receives MIDI drum input on mido's callback thread and timestamps it there.
+
+    Each mapped note is stamped with clock() the moment it arrives, so the
+    judgement no longer depends on when the game loop next runs. Events go
+    through a deque (append and popleft are atomic in CPython, so producer
+    and consumer never lock each other) and are drained once per frame with
+    drain(). on_hit, if given, is called on the input thread for every pad
+    press so the hit sound can start before the next frame. If recorder is
+    set, every note on/off is also recorded raw, mapped or not.
+    """
+
+    def __init__(self, note_map, clock, on_hit=None):
+        """
+        Args:
+            note_map (dict): MIDI note number -> DTX channel.
+            clock (callable): Returns the current song time in ms; must be
+                safe to call from another thread.
+            on_hit (callable): on_hit(channel, time_ms, velocity), called on
+                the input thread.
+        """
+        self.note_map = note_map
+        self.clock = clock
+        self.on_hit = on_hit
+        self.events = deque()
+        self.port = None
+        self.recorder = None
+        self.status = "MIDI: Init..."
+
+    def open(self):
+        """Opens the preferred input port. Returns True on success."""
+        try:
+            if mido is None:
+                raise ImportError("No module named 'mido'")
+            inputs = mido.get_input_names()
+            logging.info(f"Available MIDI Inputs: {inputs}")
+            target_port = pick_input_port(inputs)
+            if not target_port:
+                self.status = "MIDI: No Devices Found"
+                return False
+            self.port = mido.open_input(target_port, callback=self._on_message)
+            logging.info(f"Opened MIDI Input: {target_port}")
+            self.status = f"MIDI: {target_port}"
+            return True
+        except Exception as e:
+            logging.error(f"Failed to initialize MIDI: {e}")
+            self.status = "MIDI: Error"
+            return False
+
+    def _on_message(self, msg):
+        """Runs on the MIDI backend thread."""
+        time_ms = self.clock()
+        if self.recorder is not None and msg.type in ("note_on", "note_off"):
+            down = msg.type == "note_on" and msg.velocity > 0
+            self.recorder.append(time_ms, msg.note, msg.velocity, SOURCE_MIDI, PAD_DOWN if down else PAD_UP)
+        if msg.type == "note_on" and msg.velocity > 0:
+            channel = self.note_map.get(msg.note)
+            if channel is None:
+                return
+            if self.on_hit:
+                try:
+                    self.on_hit(channel, time_ms, msg.velocity)
+                except Exception as e:
+                    logging.error(f"MIDI hit handler failed: {e}")
+            self.events.append((PAD_DOWN, channel, time_ms, msg.velocity))
+        elif msg.type == "note_off" or (msg.type == "note_on" and msg.velocity == 0):
+            channel = self.note_map.get(msg.note)
+            if channel is not None:
+                self.events.append((PAD_UP, channel, time_ms, 0))
+
+    def drain(self):
+        """Yields (kind, channel, time_ms, velocity) events received since the last call."""
+        events = self.events
+        while events:
+            yield events.popleft()
+
+    def close(self):
+        if self.port:
+            self.port.close()
+            self.port = None
@@ -0,0 +1,277 @@
+import logging
+from bisect import bisect_left
+import pygame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class _Voice:
+    """One sounding sample. Positions are absolute frames on the mixer timeline."""
+
+    __slots__ = ("samples", "channel", "start", "end", "gain", "fade_start")
+
+    def __init__(self, samples, channel, start, gain):
+        self.samples = samples
+        self.channel = channel
+        self.start = start
+        self.end = start + len(samples)
+        self.gain = gain
+        self.fade_start = None
+
+
+class ChipMixer:
+    """
+    Mixes chips into PCM at exact sample offsets with NumPy.
+
+    Chips are placed on a frame timeline derived from their chart time, so
+    their timing no longer depends on when the game loop notices them. The
+    rules of AudioManager.play_note are applied at the chip's own frame:
+    choke groups fade out the choked channels, a channel holding
+    POLYPHONY_LIMIT voices fades out its oldest one, and each voice is scaled
+    by se_volume and the chip's #VOLUME. Fade lengths match the pygame path.
+
+    The mixer does not talk to an audio device; MixerStream feeds its output
+    to pygame. Pad hits are not mixed here: they play on the AudioManager
+    voice pool as they arrive, which a block of lookahead would only delay.
+    """
+
+    # Chips this late (e.g. after an output underrun) are dropped, not played.
+    MAX_LATE_MS = 100
+
+    def __init__(
+        self,
+        chips,
+        samples,
+        wav_volumes,
+        sample_rate,
+        channels,
+        choke_map,
+        polyphony_limit,
+        se_volume=1.0,
+        fade_in_ms=10,
+        fade_out_ms=100,
+    ):
+        """
+        Args:
+            chips (list): Chip objects sorted by time.
+            samples (dict): WAV ID -> int16 array of shape (frames, channels).
+                May be filled in while the mixer runs (background loading).
+            wav_volumes (dict): WAV ID -> #VOLUME percentage.
+            sample_rate (int): Output rate; samples must already be at it.
+            channels (int): Output channel count.
+            choke_map (dict): Channel -> channels it chokes.
+            polyphony_limit (int): Voices per channel before stealing.
+        """
+        if np is None:
+            raise ImportError("ChipMixer requires NumPy.")
+        self.chips = chips
+        self.samples = samples
+        self.wav_volumes = wav_volumes
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.choke_map = choke_map
+        self.polyphony_limit = polyphony_limit
+        self.se_volume = se_volume
+        self.fade_in_frames = max(1, int(sample_rate * fade_in_ms / 1000))
+        self.fade_out_frames = max(1, int(sample_rate * fade_out_ms / 1000))
+        self.auto_mode = True
+
+        self._chip_times = [chip.time for chip in chips]
+        self._voices = []
+        self._by_channel = {}  # Channel -> voices counted for polyphony, oldest first
+        self.reset(0.0)
+
+    # --- Timeline ---
+
+    def frame_to_ms(self, frame):
+        return self.origin_ms + (frame - self.origin_frame) * 1000.0 / self.sample_rate
+
+    def ms_to_frame(self, time_ms):
+        return self.origin_frame + int(round((time_ms - self.origin_ms) * self.sample_rate / 1000.0))
+
+    def reset(self, time_ms):
+        """Silences every voice and continues rendering from time_ms."""
+        self._voices.clear()
+        self._by_channel.clear()
+        self.frame = 0
+        self.origin_frame = 0
+        self.origin_ms = time_ms
+        self.cursor = bisect_left(self._chip_times, time_ms)
+
+    def resync(self, time_ms):
+        """Moves the timeline so the next block starts at time_ms, keeping voices."""
+        self.origin_frame = self.frame
+        self.origin_ms = time_ms
+
+    # --- Voices ---
+
+    def _fade(self, voice, frame):
+        if voice.fade_start is None or voice.fade_start > frame:
+            voice.fade_start = max(frame, voice.start)
+            voice.end = min(voice.end, voice.fade_start + self.fade_out_frames)
+
+    def _start_voice(self, channel, wav, frame):
+        samples = self.samples.get(wav)
+        if samples is None or not len(samples):
+            return
+
+        for choked in self.choke_map.get(channel, ()):
+            for voice in self._by_channel.pop(choked, ()):
+                self._fade(voice, frame)
+
+        playing = [voice for voice in self._by_channel.get(channel, ()) if voice.end > frame]
+        while len(playing) >= self.polyphony_limit:
+            self._fade(playing.pop(0), frame)
+
+        gain = self.se_volume * self.wav_volumes.get(wav, 100) / 100.0
+        voice = _Voice(samples, channel, frame, gain)
+        playing.append(voice)
+        self._by_channel[channel] = playing
+        self._voices.append(voice)
+
+    def _schedule(self, block_start, block_end):
+        """Starts every voice that begins before block_end, in chart order."""
+        end_ms = self.frame_to_ms(block_end)
+        late_frames = self.sample_rate * self.MAX_LATE_MS // 1000
+        chips = self.chips
+        while self.cursor < len(chips) and chips[self.cursor].time < end_ms:
+            chip = chips[self.cursor]
+            self.cursor += 1
+            if chip.is_playable and not self.auto_mode:
+                continue
+            frame = self.ms_to_frame(chip.time)
+            if frame < block_start:
+                if block_start - frame > late_frames:
+                    continue
+                frame = block_start
+            self._start_voice(chip.channel, chip.wav, frame)
+
+    # --- Rendering ---
+
+    def render(self, frames):
+        """
+        Mixes the next block.
+
+        Returns:
+            numpy.ndarray: float32 array of shape (frames, channels), in int16
+            units (not clipped).
+        """
+        b0 = self.frame
+        b1 = b0 + frames
+        self._schedule(b0, b1)
+
+        out = np.zeros((frames, self.channels), dtype=np.float32)
+        for voice in self._voices:
+            s0 = max(b0, voice.start)
+            s1 = min(b1, voice.end)
+            if s1 <= s0:
+                continue
+            segment = voice.samples[s0 - voice.start : s1 - voice.start].astype(np.float32)
+            fading_in = s0 - voice.start < self.fade_in_frames
+            fading_out = voice.fade_start is not None and s1 > voice.fade_start
+            if fading_in or fading_out:
+                # Offsets relative to the voice keep float precision on long songs.
+                offset = np.arange(s0 - voice.start, s1 - voice.start)
+                envelope = np.clip(offset / self.fade_in_frames, 0.0, 1.0)
+                if fading_out:
+                    fade_offset = offset - (voice.fade_start - voice.start)
+                    envelope *= np.clip(1.0 - fade_offset / self.fade_out_frames, 0.0, 1.0)
+                segment *= (envelope * voice.gain)[:, None]
+            else:
+                segment *= voice.gain
+            out[s0 - b0 : s1 - b0] += segment
+
+        self._voices = [voice for voice in self._voices if voice.end > b1]
+        for channel, voices in list(self._by_channel.items()):
+            voices = [voice for voice in voices if voice.end > b1]
+            if voices:
+                self._by_channel[channel] = voices
+            else:
+                del self._by_channel[channel]
+        self.frame = b1
+        return out
+
+    @property
+    def active_voices(self):
+        return len(self._voices)
+
+
+def to_int16(block):
+    """Clips a rendered float block to int16 PCM."""
+    return np.clip(block, -32768, 32767).astype(np.int16)
+
+
+class MixerStream:
+    """
+    Plays a ChipMixer through a reserved pygame mixer channel.
+
+    Blocks of one mixer buffer are rendered ahead of time and queued on the
+    channel, so chips land on exact sample offsets inside the output stream
+    however irregular the game loop is. A block must cover a whole device
+    callback, or the playing and queued blocks are both used up in one
+    callback and the stream runs dry. pump() must run more often than one
+    block lasts (~23ms at 44.1kHz); the 240 Hz game loop does. If the stream
+    runs dry anyway, the timeline is re-anchored to the game clock.
+    """
+
+    def __init__(self, audio_manager, chips):
+        frequency, size, channels = pygame.mixer.get_init()
+        if size != -16:
+            raise ValueError(f"MixerStream needs a signed 16-bit mixer, got size {size}.")
+        self.audio_manager = audio_manager
+        self.block_frames = audio_manager.MIXER_BUFFER_FRAMES
+        self._arrays = {}
+        self.mixer = ChipMixer(
+            chips,
+            self._arrays,
+            audio_manager.dtx.wav_volumes,
+            frequency,
+            channels,
+            audio_manager.choke_map,
+            audio_manager.POLYPHONY_LIMIT,
+            se_volume=audio_manager.se_volume,
+            fade_in_ms=audio_manager.se_fade_in_ms,
+            fade_out_ms=audio_manager.se_fade_out_ms,
+        )
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+        self.underruns = 0
+
+    def _sync_samples(self):
+        """Exposes newly loaded Sounds to the mixer without copying them."""
+        sounds = self.audio_manager.sounds
+        if len(self._arrays) == len(sounds):
+            return
+        for wav_id, sound in list(sounds.items()):
+            if wav_id not in self._arrays:
+                samples = pygame.sndarray.samples(sound)
+                self._arrays[wav_id] = samples.reshape(len(samples), -1)
+
+    def start(self, time_ms):
+        """Starts (or restarts after a seek) the stream at a chart time."""
+        self.channel.stop()
+        self.mixer.reset(time_ms)
+
+    def pump(self, current_time_ms):
+        """Keeps one block playing and one queued. Call once per frame."""
+        self.mixer.se_volume = self.audio_manager.se_volume
+        if not self.channel.get_busy():
+            if self.mixer.frame:
+                self.underruns += 1
+                logging.debug(f"Mixer stream underrun at {current_time_ms:.0f}ms; re-anchoring.")
+            self.mixer.resync(current_time_ms)
+            self._sync_samples()
+            self.channel.play(self._next_sound())
+        if self.channel.get_queue() is None:
+            self._sync_samples()
+            self.channel.queue(self._next_sound())
+
+    def _next_sound(self):
+        block = to_int16(self.mixer.render(self.block_frames))
+        return pygame.mixer.Sound(buffer=block.tobytes())
+
+    def stop(self):
+        self.channel.stop()
@@ -0,0 +1,276 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+import pygame
+from chip import Chip
+from mixer import ChipMixer, to_int16
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Practice speeds, as a fraction of the chart tempo.
+MIN_SPEED = 0.5
+MAX_SPEED = 1.0
+SPEED_STEP = 0.05
+
+# Rendered loop layers kept in memory (stretched BGM and chip mixes).
+LOOP_CACHE_SIZE = 8
+
+# WSOLA analysis window and how far each window may move to line up with
+# the previous one. 40 ms windows keep drum transients reasonably tight.
+STRETCH_WINDOW_MS = 40
+STRETCH_SEARCH_MS = 10
+# The similarity search runs on a mono signal decimated by this factor.
+STRETCH_SEARCH_DECIMATION = 4
+
+# Chip tails longer than this past the loop end are cut.
+LOOP_TAIL_MS = 2000
+# Fade applied to the BGM at the loop seam to avoid a click.
+LOOP_SEAM_MS = 5
+
+# pygame mixer channel the loop plays on: the one reserved for MixerStream,
+# which is stopped while practising.
+LOOP_CHANNEL = 0
+
+
+def time_stretch(samples, speed, sample_rate):
+    """
+    Changes the tempo of PCM by speed without changing its pitch (WSOLA).
+
+    Windows are read from the input every hop * speed frames and
+    overlap-added every hop frames; each window is shifted by up to
+    STRETCH_SEARCH_MS to where it best continues the previous one, which
+    avoids the phasing of plain overlap-add.
+
+    Args:
+        samples (numpy.ndarray): PCM of shape (frames, channels).
+        speed (float): Playback speed; 0.5 doubles the length.
+        sample_rate (int): Sample rate of samples.
+
+    Returns:
+        numpy.ndarray: float32 PCM of shape (round(frames / speed), channels).
+    """
+    x = np.asarray(samples, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[:, None]
+    out_frames = int(round(len(x) / speed))
+    if speed == 1.0 or not len(x):
+        return x[:out_frames].copy()
+
+    window_frames = int(sample_rate * STRETCH_WINDOW_MS / 1000) // 2 * 2
+    hop = window_frames // 2
+    search = int(sample_rate * STRETCH_SEARCH_MS / 1000)
+    # Periodic Hann: windows at half-window hops sum to exactly one.
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(window_frames) / window_frames)).astype(np.float32)
+    # Nothing overlaps the first half of the first window, so it stays at full gain
+    first = window.copy()
+    first[:hop] = 1.0
+
+    padded = np.concatenate([x, np.zeros((window_frames + search, x.shape[1]), dtype=np.float32)])
+    step = STRETCH_SEARCH_DECIMATION
+    mono = padded.mean(axis=1)[::step]
+    target_len = window_frames // step
+    search_len = search // step
+
+    out = np.zeros((out_frames + window_frames, x.shape[1]), dtype=np.float32)
+    last_start = len(x)
+    previous = 0
+    for k in range((out_frames + hop - 1) // hop + 1):
+        nominal = int(k * hop * speed)
+        if k == 0:
+            start = 0
+        else:
+            # Find where the natural continuation of the previous window is
+            # most similar, around the nominal read position
+            natural = (previous + hop) // step
+            target = mono[natural : natural + target_len]
+            lo = max(0, nominal // step - search_len)
+            hi = min(last_start // step, nominal // step + search_len)
+            if hi <= lo:
+                start = min(nominal, last_start)
+            else:
+                region = mono[lo : hi + target_len]
+                score = np.correlate(region, target, mode="valid")
+                start = (lo + int(np.argmax(score))) * step
+        o = k * hop
+        if o >= out_frames:
+            break
+        out[o : o + window_frames] += padded[start : start + window_frames] * (first if k == 0 else window)[:, None]
+        previous = start
+    return out[:out_frames]
+
+
+class SectionLoop:
+    """
+    An A-B practice loop over whole measures, at a reduced speed.
+
+    The loop is built from two layers of float PCM, each one loop long:
+    the BGM segment time-stretched with time_stretch, and the chips of the
+    section (all of them in auto mode, only the unplayable ones otherwise)
+    mixed by ChipMixer at their times divided by the speed. Chip tails that
+    run past the loop end are wrapped onto its start. Both layers are
+    rendered at unit gain and cached, the BGM per (BGM, section, speed) and
+    the chips per (section, speed, auto mode). A volume change or auto
+    toggle therefore only re-scales and sums cached layers, and the BGM is
+    stretched once per section and speed. The Sound is played with
+    loops=-1, so every restart is the mixer re-reading the same buffer: no
+    stream re-open and no gap.
+    """
+
+    # Layer caches shared by every loop, least recently used first.
+    _cache = OrderedDict()
+    # The decoded BGM of the current chart, (path, samples), kept apart from
+    # the layer cache so it never pushes out the layers it serves.
+    _bgm = (None, None)
+
+    def __init__(self, audio_manager, chips, first_measure, last_measure, speed=1.0):
+        """
+        Args:
+            audio_manager (AudioManager): Supplies the samples, BGM and mix settings.
+            chips (list): The game's Chip list.
+            first_measure (int): First measure of the loop.
+            last_measure (int): Last measure of the loop (inclusive).
+            speed (float): MIN_SPEED to MAX_SPEED.
+        """
+        if np is None:
+            raise ImportError("Practice loops require NumPy.")
+        if last_measure < first_measure:
+            raise ValueError(f"Loop end measure {last_measure} is before start measure {first_measure}.")
+        self.audio_manager = audio_manager
+        self.chips = chips
+        self.first_measure = first_measure
+        self.last_measure = last_measure
+        tempo = audio_manager.dtx.tempo_map()
+        self.start_ms = tempo.measure_to_ms(first_measure)
+        self.end_ms = tempo.measure_to_ms(last_measure + 1)
+        self.speed = min(MAX_SPEED, max(MIN_SPEED, speed))
+        self.channel = pygame.mixer.Channel(LOOP_CHANNEL)
+
+    @property
+    def length_ms(self):
+        """Section length in chart time."""
+        return self.end_ms - self.start_ms
+
+    def _loop_frames(self, sample_rate):
+        return int(round(self.length_ms / self.speed * sample_rate / 1000))
+
+    def _bgm_samples(self):
+        path = self.audio_manager.bgm_path
+        if not path:
+            return None
+        cached_path, samples = SectionLoop._bgm
+        if cached_path != path:
+            try:
+                sound = self.audio_manager._decode(path)
+            except pygame.error as e:
+                logging.warning(f"Could not decode BGM '{os.path.basename(path)}'. Error: {e}")
+                return None
+            samples = pygame.sndarray.array(sound)
+            SectionLoop._bgm = (path, samples)
+        return samples
+
+    def _cached(self, key, render):
+        if key in self._cache:
+            value = self._cache[key]
+        else:
+            value = render()
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > LOOP_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return value
+
+    def _render_bgm(self):
+        """The stretched BGM layer at unit gain, or None without a BGM."""
+        manager = self.audio_manager
+        bgm = self._bgm_samples()
+        if bgm is None:
+            return None
+        sample_rate, _, channels = pygame.mixer.get_init()
+        speed = self.speed
+        loop_frames = self._loop_frames(sample_rate)
+        out = np.zeros((loop_frames, channels), dtype=np.float32)
+
+        bgm = bgm.reshape(len(bgm), -1)
+        offset = self.start_ms - manager.dtx.bgm_start_time_ms
+        b0 = int(round(offset * sample_rate / 1000))
+        b1 = int(round((self.end_ms - manager.dtx.bgm_start_time_ms) * sample_rate / 1000))
+        segment = bgm[max(0, b0) : max(0, b1)]
+        start = time.perf_counter()
+        stretched = time_stretch(segment, speed, sample_rate)
+        seam = min(len(stretched) // 2, int(LOOP_SEAM_MS * sample_rate / 1000))
+        if seam:
+            ramp = np.linspace(0.0, 1.0, seam, dtype=np.float32)[:, None]
+            stretched[:seam] *= ramp
+            stretched[-seam:] *= ramp[::-1]
+        # A section starting before the BGM does keeps the BGM in place
+        at = int(round(max(0.0, -offset) / speed * sample_rate / 1000))
+        n = min(len(stretched), loop_frames - at)
+        if n > 0:
+            out[at : at + n] += stretched[:n]
+        logging.info(
+            f"Stretched BGM for m{self.first_measure}-{self.last_measure} to {speed:.0%} "
+            f"in {(time.perf_counter() - start) * 1000:.0f}ms."
+        )
+        return out
+
+    def _render_chips(self, auto_mode):
+        """The chip layer at unit SE volume, tails wrapped onto the loop start."""
+        manager = self.audio_manager
+        sample_rate, _, channels = pygame.mixer.get_init()
+        speed = self.speed
+        loop_frames = self._loop_frames(sample_rate)
+        tail_frames = int(LOOP_TAIL_MS * sample_rate / 1000)
+
+        section = [
+            Chip((chip.time - self.start_ms) / speed, chip.channel, chip.wav, chip.channel_id, chip.wav_id, chip.is_playable)
+            for chip in self.chips
+            if self.start_ms <= chip.time < self.end_ms
+        ]
+        samples = {}
+        for wav_id, sound in list(manager.sounds.items()):
+            data = pygame.sndarray.samples(sound)
+            samples[wav_id] = data.reshape(len(data), -1)
+        mixer = ChipMixer(
+            section,
+            samples,
+            manager.dtx.wav_volumes,
+            sample_rate,
+            channels,
+            manager.choke_map,
+            manager.POLYPHONY_LIMIT,
+            se_volume=1.0,
+            fade_in_ms=manager.se_fade_in_ms,
+            fade_out_ms=manager.se_fade_out_ms,
+        )
+        mixer.auto_mode = auto_mode
+        out = mixer.render(loop_frames + tail_frames)
+
+        # Wrap tails past the loop end onto its start
+        loop = out[:loop_frames]
+        loop[: min(tail_frames, loop_frames)] += out[loop_frames : loop_frames + min(tail_frames, loop_frames)]
+        return loop
+
+    def sound(self, auto_mode):
+        """The loop for the current speed and mix, built from cached layers where possible."""
+        manager = self.audio_manager
+        section = (self.start_ms, self.end_ms, self.speed)
+        bgm = self._cached(("bgm", manager.bgm_path) + section, self._render_bgm)
+        chips = self._cached(
+            ("chips", manager.dtx.dtx_path, auto_mode, len(manager.sounds)) + section,
+            lambda: self._render_chips(auto_mode),
+        )
+        mix = chips * np.float32(manager.se_volume)
+        if bgm is not None:
+            mix += bgm * np.float32(manager.bgm_volume)
+        return pygame.mixer.Sound(buffer=to_int16(mix).tobytes())
+
+    def play(self, auto_mode):
+        """Starts (or swaps in) the loop from its beginning."""
+        self.channel.play(self.sound(auto_mode), loops=-1)
+
+    def stop(self):
+        self.channel.stop()
@@ -0,0 +1,206 @@
+import os
+import sys
+import time
+import wave
+import logging
+
+# Rendering needs no sound card; this must be set before pygame opens audio.
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from audio import AudioManager
+from chart_cache import load_chart
+from mixer import ChipMixer, to_int16
+from sample_cache import PcmCache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+# Frames mixed per step. Large blocks keep the per-voice NumPy work vectorized.
+RENDER_BLOCK_FRAMES = 65536
+
+
+class _WavWriter:
+    def __init__(self, path, sample_rate, channels):
+        self._file = wave.open(path, "wb")
+        self._file.setnchannels(channels)
+        self._file.setsampwidth(2)
+        self._file.setframerate(sample_rate)
+
+    def write(self, block):
+        self._file.writeframes(block.tobytes())
+
+    def close(self):
+        self._file.close()
+
+
+class _FlacWriter:
+    def __init__(self, path, sample_rate, channels):
+        self._file = soundfile.SoundFile(path, "w", samplerate=sample_rate, channels=channels, subtype="PCM_16")
+
+    def write(self, block):
+        self._file.write(block)
+
+    def close(self):
+        self._file.close()
+
+
+def _writer_class(path):
+    if path.lower().endswith(".flac"):
+        if soundfile is None:
+            raise ImportError("FLAC output requires the 'soundfile' package.")
+        return _FlacWriter
+    return _WavWriter
+
+
+def render_chart(
+    dtx, output_path, start_ms=0.0, duration_ms=None, bgm_volume=0.7, se_volume=1.0, use_cache=True, choke_groups=None
+):
+    """
+    Mixes a chart's BGM and every chip into a WAV or FLAC file, headless.
+
+    All chips are played as in auto mode, with the same choke, polyphony,
+    #VOLUME and fade rules as the live ChipMixer. Output is written block by
+    block, so memory stays flat however long the song is.
+
+    Args:
+        dtx (Dtx): A parsed chart.
+        output_path (str): Destination; ".flac" needs soundfile, anything else
+            is written as 16-bit WAV.
+        start_ms (float): Chart time to start from (for previews).
+        duration_ms (float): Length to render; by default until the BGM and
+            the last chip have finished.
+        bgm_volume (float): BGM gain, 0.0-1.0.
+        se_volume (float): Chip gain, 0.0-1.0.
+        use_cache (bool): Decode samples through the PCM cache.
+        choke_groups (dict): Choke configuration (see voices.py).
+
+    Returns:
+        dict: "duration_s", "elapsed_s", "realtime_factor", "peak" (0.0-1.0
+        of full scale) and "clipped" (samples clipped to int16).
+    """
+    if np is None:
+        raise ImportError("Offline rendering requires NumPy.")
+    writer_class = _writer_class(output_path)
+    start = time.perf_counter()
+
+    audio = AudioManager(dtx, PcmCache() if use_cache else None, choke_groups=choke_groups)
+    audio.load_sounds(ahead_ms=float("inf"))
+    sample_rate, size, channels = pygame.mixer.get_init()
+    if size != -16:
+        raise ValueError(f"Offline rendering needs a signed 16-bit mixer, got size {size}.")
+
+    samples = {}
+    for wav_id, sound in audio.sounds.items():
+        data = pygame.sndarray.samples(sound)
+        samples[wav_id] = data.reshape(len(data), -1)
+
+    bgm = None
+    if audio.bgm_path:
+        try:
+            bgm_sound = audio._decode(audio.bgm_path)
+            bgm = pygame.sndarray.samples(bgm_sound)
+            bgm = bgm.reshape(len(bgm), -1)
+        except pygame.error as e:
+            logging.warning(f"Could not decode BGM '{os.path.basename(audio.bgm_path)}'. Error: {e}")
+
+    chips = dtx.build_chips()
+    mixer = ChipMixer(
+        chips,
+        samples,
+        dtx.wav_volumes,
+        sample_rate,
+        channels,
+        audio.choke_map,
+        audio.POLYPHONY_LIMIT,
+        se_volume=se_volume,
+        fade_in_ms=audio.se_fade_in_ms,
+        fade_out_ms=audio.se_fade_out_ms,
+    )
+    mixer.reset(start_ms)
+
+    bgm_start = mixer.ms_to_frame(dtx.bgm_start_time_ms)
+    bgm_end = bgm_start + (len(bgm) if bgm is not None else 0)
+    total_frames = int(duration_ms * sample_rate / 1000) if duration_ms is not None else None
+
+    writer = writer_class(output_path, sample_rate, channels)
+    peak = 0.0
+    clipped = 0
+    try:
+        while True:
+            frames = RENDER_BLOCK_FRAMES
+            if total_frames is not None:
+                frames = min(frames, total_frames - mixer.frame)
+                if frames <= 0:
+                    break
+            elif mixer.cursor >= len(chips) and not mixer.active_voices and mixer.frame >= bgm_end:
+                break
+
+            b0 = mixer.frame
+            block = mixer.render(frames)
+            s0, s1 = max(b0, bgm_start), min(b0 + frames, bgm_end)
+            if bgm is not None and s1 > s0:
+                block[s0 - b0 : s1 - b0] += bgm[s0 - bgm_start : s1 - bgm_start] * np.float32(bgm_volume)
+
+            block_peak = float(np.abs(block).max()) if len(block) else 0.0
+            peak = max(peak, block_peak)
+            if block_peak > 32767:
+                clipped += int(np.count_nonzero(np.abs(block) > 32767))
+            writer.write(to_int16(block))
+    finally:
+        writer.close()
+        audio.close()
+
+    elapsed = time.perf_counter() - start
+    duration_s = mixer.frame / sample_rate
+    stats = {
+        "duration_s": duration_s,
+        "elapsed_s": elapsed,
+        "realtime_factor": duration_s / elapsed if elapsed > 0 else 0.0,
+        "peak": peak / 32768,
+        "clipped": clipped,
+    }
+    logging.info(
+        f"Rendered '{os.path.basename(output_path)}': {duration_s:.1f}s of audio in {elapsed:.2f}s "
+        f"({stats['realtime_factor']:.0f}x realtime), peak {stats['peak']:.0%}, {clipped} samples clipped."
+    )
+    return stats
+
+
+def main():
+    """Renders a chart to an audio file from the command line."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)-7s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print("Usage: python render.py <path_to_dtx_file> [output.wav|output.flac] [--start=s] [--duration=s] [--no-cache]")
+        sys.exit(1)
+
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    dtx_path = args[0]
+    output_path = args[1] if len(args) > 1 else os.path.splitext(dtx_path)[0] + ".wav"
+    use_cache = "--no-cache" not in sys.argv
+    duration = options.get("duration")
+
+    dtx = load_chart(dtx_path, use_cache=use_cache)
+    render_chart(
+        dtx,
+        output_path,
+        start_ms=float(options.get("start", 0)) * 1000,
+        duration_ms=float(duration) * 1000 if duration else None,
+        use_cache=use_cache,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import mmap
+import hashlib
+import logging
+import threading
+import pygame
+
+# Default cache location; override with the DTX_PCM_CACHE environment variable.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dtx_player", "pcm")
+
+PCM_SUFFIX = ".pcm"
+
+
+def content_key(path):
+    """Returns a hex BLAKE2b digest of a file's contents."""
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+class PcmCache:
+    """
+    On-disk cache of decoded samples in the mixer's own format.
+
+    Entries are keyed by the source file's content hash plus the mixer
+    format (rate, sample size, channels), so the same sample copied into
+    several song folders is decoded once, and a change of mixer settings
+    never reuses stale PCM. A hit memory-maps the raw PCM and hands it to
+    pygame.mixer.Sound(buffer=...), skipping Vorbis/WAV decoding entirely.
+
+    Safe to call from the AudioManager loader threads.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.environ.get("DTX_PCM_CACHE") or DEFAULT_CACHE_DIR
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_mapped = 0
+        self.bytes_written = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _entry_path(self, key):
+        frequency, size, channels = pygame.mixer.get_init()
+        return os.path.join(self.cache_dir, key[:2], f"{key}-{frequency}-{size}-{channels}{PCM_SUFFIX}")
+
+    def load(self, path, key=None):
+        """
+        Returns a pygame Sound for the file, from the cache when possible.
+
+        Args:
+            path (str): The sample file.
+            key (str): The file's content_key(), if the caller already has it.
+
+        Raises:
+            pygame.error: If the file is not in the cache and cannot be decoded.
+            OSError: If the source file cannot be read.
+        """
+        entry_path = self._entry_path(key or content_key(path))
+        try:
+            with open(entry_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                sound = pygame.mixer.Sound(buffer=mapped)
+                mapped_size = len(mapped)
+        except (OSError, ValueError):
+            # Missing or empty entry (mmap rejects empty files): decode it.
+            pass
+        else:
+            with self._lock:
+                self.hits += 1
+                self.bytes_mapped += mapped_size
+            return sound
+
+        sound = pygame.mixer.Sound(path)
+        written = self._store(entry_path, sound.get_raw())
+        with self._lock:
+            self.misses += 1
+            self.bytes_written += written
+        return sound
+
+    def _store(self, entry_path, raw):
+        """Writes raw PCM atomically. Returns the bytes written (0 on failure)."""
+        if not raw:
+            return 0
+        tmp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(raw)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logging.warning(f"Could not write PCM cache entry '{entry_path}': {e}")
+            return 0
+        return len(raw)
+
+    def summary(self):
+        """One-line statistics for logging."""
+        return (
+            f"PCM cache: {self.hits} hits / {self.misses} misses ({self.hit_rate:.0%}), "
+            f"{self.bytes_mapped / 1048576:.1f} MiB mapped, {self.bytes_written / 1048576:.1f} MiB written"
+        )
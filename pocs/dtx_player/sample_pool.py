@@ -0,0 +1,145 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+import pygame
+from sample_cache import content_key
+
+# Default memory budget for decoded samples that no chart is using.
+DEFAULT_POOL_BYTES = 512 * 1024 * 1024
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_sample_pool():
+    """Returns the process-wide SamplePool, creating it on first use."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SamplePool()
+        return _shared_pool
+
+
+def sound_nbytes(sound):
+    """Estimates the decoded size of a Sound from its length and the mixer format."""
+    frequency, size, channels = pygame.mixer.get_init()
+    return int(round(sound.get_length() * frequency)) * (abs(size) // 8) * channels
+
+
+class SamplePool:
+    """
+    Process-wide store of decoded samples, keyed by source content hash.
+
+    The same file copied into several song folders (a common pattern in DTX
+    libraries) is decoded once and shared. Each AudioManager acquires the
+    samples it needs and releases them when it closes. Released samples stay
+    decoded for the next chart until the pool exceeds max_bytes, at which
+    point the least recently used unreferenced samples are dropped. Samples
+    still referenced are never evicted, so the budget can be exceeded while
+    a chart needs more than it allows.
+
+    Safe to call from the AudioManager loader threads.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_POOL_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> [sound, refcount, nbytes], least recently used first.
+        self._entries = OrderedDict()
+        # (path, size, mtime_ns) -> key, so unchanged files are hashed once.
+        self._keys = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key_for(self, path):
+        """Returns the content key of a file, memoized by path, size and mtime."""
+        st = os.stat(path)
+        stamp = (path, st.st_size, st.st_mtime_ns)
+        key = self._keys.get(stamp)
+        if key is None:
+            key = content_key(path)
+            self._keys[stamp] = key
+        return key
+
+    def acquire(self, path, decode):
+        """
+        Returns a shared Sound for the file and takes a reference to it.
+
+        Args:
+            path (str): The sample file.
+            decode (callable): decode(path, key) -> Sound, used on a miss.
+
+        Returns:
+            tuple: (key, Sound). Pass key to release() when done.
+
+        Raises:
+            Whatever decode raises, plus OSError if the file cannot be read.
+        """
+        key = self.key_for(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] += 1
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, entry[0]
+
+        # Decode outside the lock so loader threads run in parallel. If two
+        # threads race on the same key, the first one stored wins.
+        sound = decode(path, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] += 1
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, entry[0]
+            nbytes = sound_nbytes(sound)
+            self._entries[key] = [sound, 1, nbytes]
+            self.total_bytes += nbytes
+            self.misses += 1
+            self._evict()
+        return key, sound
+
+    def release(self, key):
+        """Drops one reference taken by acquire()."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= 0:
+                logging.warning(f"Sample pool: release of unreferenced sample {key}")
+                return
+            entry[1] -= 1
+            self._evict()
+
+    def _evict(self):
+        """Drops unreferenced samples, oldest first, until under max_bytes. Caller holds the lock."""
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in [key for key, entry in self._entries.items() if entry[1] == 0]:
+            if self.total_bytes <= self.max_bytes:
+                break
+            _, _, nbytes = self._entries.pop(key)
+            self.total_bytes -= nbytes
+            self.evictions += 1
+
+    def clear(self):
+        """Drops every unreferenced sample."""
+        with self._lock:
+            max_bytes, self.max_bytes = self.max_bytes, 0
+            self._evict()
+            self.max_bytes = max_bytes
+
+    def summary(self):
+        """One-line statistics for logging."""
+        in_use = sum(1 for entry in self._entries.values() if entry[1] > 0)
+        return (
+            f"Sample pool: {len(self._entries)} samples ({in_use} in use), "
+            f"{self.total_bytes / 1048576:.1f}/{self.max_bytes / 1048576:.0f} MiB, "
+            f"{self.hits} hits / {self.misses} misses, {self.evictions} evicted"
+        )
@@ -0,0 +1,234 @@
+import os
+import sys
+import time
+import logging
+from chart_cache import load_chart
+from ghost import ghost_chips, read_ghost
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Judgement codes, in DTXMania order (see notes/04 and notes/05).
+PERFECT, GREAT, GOOD, POOR, MISS = range(5)
+JUDGEMENT_NAMES = ("PERFECT", "GREAT", "GOOD", "POOR", "MISS")
+
+# Default STHitRanges upper bounds (|lag| ms) for Perfect, Great, Good, Poor;
+# anything later is a Miss. Pedals have their own ranges (stDrumPedalHitRanges),
+# with the same defaults.
+HIT_RANGES = (34, 67, 84, 117)
+PEDAL_HIT_RANGES = (34, 67, 84, 117)
+PEDAL_CHANNELS = frozenset({"13", "1B", "1C"})  # BD, LP, LBD
+
+# Classic scoring: points per combo step for Perfect, Great, Good, Poor/Miss.
+# Only Perfect stops growing at combo 500 (notes/05).
+CLASSIC_COMBO_SCORE = (350, 200, 50, 0, 0)
+CLASSIC_COMBO_CAP = 500
+
+# XG scoring: share of the per-note base for each judgement; the combo
+# multiplier stops growing at 50.
+XG_MAX_SCORE = 1_000_000
+XG_WEIGHTS = (1.0, 0.5, 0.2, 0.0, 0.0)
+XG_COMBO_CAP = 50
+
+# Drum gauge deltas (fDamageGaugeDelta) and start value; see notes/06.
+GAUGE_DELTAS = (0.004, 0.002, 0.0, -0.020, -0.050)
+GAUGE_START = 0.66
+
+
+def judge_lags(lags, pedal, hit_ranges=HIT_RANGES, pedal_hit_ranges=PEDAL_HIT_RANGES):
+    """
+    Judges lags against the hit ranges.
+
+    Args:
+        lags (numpy.ndarray): Lag per chip in ms, shape (chips,) or
+            (ghosts, chips).
+        pedal (numpy.ndarray): Bool per chip, True for BD/LP/LBD.
+
+    Returns:
+        numpy.ndarray: uint8 judgement codes, same shape as lags.
+    """
+    # Judgement per whole ms of |lag|, one row per range set; a table lookup
+    # is several times faster than searchsorted on large arrays.
+    size = max(max(hit_ranges), max(pedal_hit_ranges)) + 2
+    table = np.stack([
+        np.searchsorted(np.asarray(ranges), np.arange(size), side="left").astype(np.uint8)
+        for ranges in (hit_ranges, pedal_hit_ranges)
+    ])
+    if np.issubdtype(lags.dtype, np.integer):
+        lag = np.abs(lags.astype(np.int32))  # int16 -128 has no positive counterpart
+    else:
+        lag = np.ceil(np.abs(lags)).astype(np.int32)
+    np.minimum(lag, size - 1, out=lag)
+    return table[pedal.astype(np.intp), lag]
+
+
+def combo_runs(judgements, breaks=None):
+    """
+    Combo after every chip, without a Python loop over chips.
+
+    Perfect/Great/Good add one; Poor and Miss reset to zero; a combo-break
+    flag resets before its chip is counted.
+
+    Returns:
+        numpy.ndarray: int32 combo, same shape as judgements.
+    """
+    hit = judgements <= GOOD
+    counted = np.cumsum(hit, axis=-1, dtype=np.int32)
+    # Hits counted before the current run started
+    reset = np.where(hit, 0, counted)
+    if breaks is not None:
+        reset = np.where(breaks & hit, counted - 1, reset)
+    return counted - np.maximum.accumulate(reset, axis=-1)
+
+
+def classic_scores(judgements, combo):
+    """
+    Classic (nSkillMode 0) score per ghost: base * combo, with the combo
+    capped at 500 for Perfect only, as in notes/05.
+
+    >>> int(classic_scores(np.array([PERFECT], np.uint8), np.array([501])))
+    175000
+    >>> int(classic_scores(np.array([GOOD], np.uint8), np.array([501])))
+    25050
+    """
+    base = np.asarray(CLASSIC_COMBO_SCORE, dtype=np.int32)[judgements]
+    caps = np.asarray([CLASSIC_COMBO_CAP] + [np.iinfo(np.int32).max] * 4, dtype=np.int32)
+    return (base * np.minimum(combo, caps[judgements])).sum(axis=-1, dtype=np.int64)
+
+
+def xg_scores(judgements, combo, bonus_count=0):
+    """
+    XG (nSkillMode 1) score per ghost, out of 1,000,000.
+
+    The per-note base divides the score by the sum of capped combo
+    multipliers a full combo would earn, so an all-Perfect full combo scores
+    exactly the maximum.
+    """
+    notes = judgements.shape[-1]
+    capped = min(notes, XG_COMBO_CAP)
+    steps = capped * (capped + 1) // 2 + XG_COMBO_CAP * max(0, notes - XG_COMBO_CAP)
+    if steps == 0:
+        return np.zeros(judgements.shape[:-1], dtype=np.int64)
+    base = (XG_MAX_SCORE - 500 * bonus_count) / steps
+    weights = np.asarray(XG_WEIGHTS, dtype=np.float32)[judgements]
+    scores = (weights * np.minimum(combo, XG_COMBO_CAP)).sum(axis=-1, dtype=np.float64) * base
+    return np.floor(scores + 1e-6).astype(np.int64)
+
+
+def gauge_trajectory(judgements, start=GAUGE_START, deltas=GAUGE_DELTAS):
+    """
+    Gauge after every chip, clamped to 0.0-1.0.
+
+    Clamping makes each step depend on the last, so this walks the chips
+    once, vectorized across ghosts.
+
+    Returns:
+        tuple: (gauge float32 array shaped like judgements, index of the chip
+        that emptied the gauge per ghost or -1).
+    """
+    # Chip-major, so each step works on one contiguous row of ghosts
+    steps = np.asarray(deltas, dtype=np.float32)[np.atleast_2d(judgements).T]
+    gauge = np.empty_like(steps)
+    level = np.full(steps.shape[1], start, dtype=np.float32)
+    for i in range(steps.shape[0]):
+        np.add(level, steps[i], out=level)
+        np.clip(level, 0.0, 1.0, out=level)
+        gauge[i] = level
+    gauge = gauge.T
+    empty = gauge <= 0.0
+    failed_at = np.where(empty.any(axis=1), empty.argmax(axis=1), -1)
+    if np.ndim(judgements) == 1:
+        return gauge[0], int(failed_at[0])
+    return gauge, failed_at
+
+
+def score_lags(lags, pedal, breaks=None, hit_ranges=HIT_RANGES, pedal_hit_ranges=PEDAL_HIT_RANGES):
+    """
+    Computes the full result of one or many plays from their lag arrays.
+
+    Args:
+        lags (numpy.ndarray): Lag per chip in ms, shape (chips,) or
+            (ghosts, chips). Lags beyond the Poor range count as Miss.
+        pedal (numpy.ndarray): Bool per chip, True for pedal chips.
+        breaks (numpy.ndarray): Optional combo-break flags, shaped like lags.
+
+    Returns:
+        dict: "judgements", "counts" (per judgement code), "combo",
+        "max_combo", "classic", "xg", "gauge" and "failed_at".
+    """
+    if np is None:
+        raise ImportError("Scoring requires NumPy.")
+    lags = np.asarray(lags)
+    pedal = np.asarray(pedal, dtype=bool)
+    judgements = judge_lags(lags, pedal, hit_ranges, pedal_hit_ranges)
+    combo = combo_runs(judgements, breaks)
+    gauge, failed_at = gauge_trajectory(judgements)
+    counts = np.stack([(judgements == code).sum(axis=-1) for code in range(len(JUDGEMENT_NAMES))], axis=-1)
+    return {
+        "judgements": judgements,
+        "counts": counts,
+        "combo": combo,
+        "max_combo": combo.max(axis=-1, initial=0),
+        "classic": classic_scores(judgements, combo),
+        "xg": xg_scores(judgements, combo),
+        "gauge": gauge,
+        "failed_at": failed_at,
+    }
+
+
+def pedal_mask(chips):
+    """Bool array marking the pedal chips among chips."""
+    return np.fromiter((chip.channel in PEDAL_CHANNELS for chip in chips), dtype=bool, count=len(chips))
+
+
+def main():
+    """Scores ghost files against a chart from the command line."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)-7s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) < 2:
+        print("Usage: python scoring.py <path_to_dtx_file> <ghost_file> [ghost_file ...]")
+        sys.exit(1)
+
+    chips = ghost_chips(load_chart(args[0]).build_chips())
+    if not chips:
+        logging.error("The chart has no drum chips to score.")
+        sys.exit(1)
+    pedal = pedal_mask(chips)
+
+    lags, breaks, names = [], [], []
+    for path in args[1:]:
+        try:
+            ghost_lags, ghost_breaks = read_ghost(path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Skipping ghost: {e}")
+            continue
+        if len(ghost_lags) != len(chips):
+            logging.error(f"Skipping '{os.path.basename(path)}': {len(ghost_lags)} lags for {len(chips)} chips.")
+            continue
+        lags.append(ghost_lags)
+        breaks.append(ghost_breaks)
+        names.append(os.path.basename(path))
+    if not names:
+        sys.exit(1)
+
+    start = time.perf_counter()
+    result = score_lags(np.stack(lags), pedal, np.stack(breaks))
+    elapsed = time.perf_counter() - start
+    for i, name in enumerate(names):
+        counts = " ".join(f"{n.title()} {c}" for n, c in zip(JUDGEMENT_NAMES, result["counts"][i]))
+        failed = f", failed at chip {result['failed_at'][i]}" if result["failed_at"][i] >= 0 else ""
+        print(
+            f"{name:<40} {counts}  max combo {result['max_combo'][i]}  "
+            f"classic {result['classic'][i]}  XG {result['xg'][i]}  gauge {result['gauge'][i][-1]:.0%}{failed}"
+        )
+    logging.info(f"Scored {len(names)} ghost(s) of {len(chips)} chips in {elapsed * 1000:.1f}ms.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import os
+import re
+import logging
+from dtx import decode_dtx_bytes
+
+# Matches #L1LABEL..#L5LABEL and #L1FILE..#L5FILE keys.
+SLOT_KEY_RE = re.compile(r"^L([1-5])(LABEL|FILE)$")
+
+
+class SetDef:
+    """
+    Parses a set.def song pack: one or more blocks, each started by #TITLE,
+    that group up to five difficulty charts (#L1FILE..#L5FILE) under labels
+    (#L1LABEL..#L5LABEL). Follows DTXMania's CSetDef rules (see notes/10).
+    """
+
+    # Labels used when a block has a FILE without a LABEL.
+    DEFAULT_LABELS = ("NOVICE", "REGULAR", "EXPERT", "MASTER", "DTXMania")
+
+    def __init__(self, set_def_path):
+        """
+        Args:
+            set_def_path (str): The full path to the set.def file.
+
+        Raises:
+            FileNotFoundError: If the set.def file does not exist.
+        """
+        if not os.path.exists(set_def_path):
+            raise FileNotFoundError(f"set.def file not found: {set_def_path}")
+        self.set_def_path = set_def_path
+        self.directory = os.path.dirname(set_def_path) or "."
+
+        # List of {"title", "font_color", "charts"} dicts; "charts" is a list
+        # of (slot 1-5, label, chart path) tuples.
+        self.blocks = []
+
+    def parse(self):
+        """Reads the file and fills self.blocks."""
+        with open(self.set_def_path, "rb") as f:
+            content, _ = decode_dtx_bytes(f.read())
+
+        block = None
+        labels, files = {}, {}
+
+        def finish_block():
+            if block is None:
+                return
+            # LABEL without FILE is discarded; FILE without LABEL gets a default.
+            for slot in sorted(files):
+                label = labels.get(slot) or self.DEFAULT_LABELS[slot - 1]
+                block["charts"].append((slot, label, files[slot]))
+            self.blocks.append(block)
+
+        for line in content.splitlines():
+            line = line.strip()
+            if not line.startswith("#"):
+                continue
+            line = line.split(";")[0]
+            if ":" in line:
+                key, value = line[1:].split(":", 1)
+            elif " " in line:
+                key, value = line[1:].split(" ", 1)
+            else:
+                key, value = line[1:], ""
+            key = key.strip().upper()
+            value = value.strip()
+
+            if key == "TITLE":
+                finish_block()
+                block = {"title": value, "font_color": None, "charts": []}
+                labels, files = {}, {}
+                continue
+            if block is None:
+                # Slots before the first #TITLE still form a block.
+                block = {"title": "", "font_color": None, "charts": []}
+
+            if key == "FONTCOLOR":
+                block["font_color"] = value.lstrip("#")
+                continue
+            match = SLOT_KEY_RE.match(key)
+            if not match or not value:
+                continue
+            slot = int(match.group(1))
+            if match.group(2) == "LABEL":
+                labels[slot] = value
+            else:
+                normalized_value = value.replace("\\", "/")
+                files[slot] = os.path.join(self.directory, normalized_value)
+
+        finish_block()
+        logging.debug(f"Parsed {len(self.blocks)} block(s) from '{self.set_def_path}'.")
@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from chart_cache import load_chart
+from gameplay import Game
+from library import CHART_EXTENSIONS
+from midi_input import PAD_DOWN, SOURCE_MIDI
+from input_log import read_input_log
+
+# Virtual frame length; matches the 240 Hz cap of the live loop so misses
+# are detected on the same frame boundaries.
+FRAME_MS = 1000.0 / 240
+
+
+def load_input_script(path):
+    """
+    Reads an input script: a JSON list of [time_ms, channel] pad hits, or a
+    recorded input log (.dtxi), whose pad presses are mapped with
+    Game.GM_MIDI_MAP. Keyboard events in a log (seeks, volume) are ignored.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If it is not a list of [number, string] pairs.
+    """
+    if path.lower().endswith(".dtxi"):
+        _, records = read_input_log(path)
+        return sorted(
+            (time_ms, Game.GM_MIDI_MAP[code])
+            for time_ms, code, _, source, kind in records
+            if source == SOURCE_MIDI and kind == PAD_DOWN and code in Game.GM_MIDI_MAP
+        )
+    with open(path, "r", encoding="utf-8") as f:
+        hits = json.load(f)
+    try:
+        return sorted((float(t), str(channel)) for t, channel in hits)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Input script '{path}' must be a list of [time_ms, channel] pairs: {e}")
+
+
+def synthetic_script(chips, offset_ms=0.0, jitter_ms=0.0, skip_rate=0.0, seed=0):
+    """
+    Builds an input script that plays every playable chip, for runs without
+    a recording.
+
+    Args:
+        chips (list): Chip objects.
+        offset_ms (float): Constant lag added to every hit.
+        jitter_ms (float): Standard deviation of random timing error.
+        skip_rate (float): Fraction of chips not played at all.
+        seed (int): Random seed, so runs are reproducible.
+
+    Returns:
+        list: Sorted (time_ms, channel) hits.
+    """
+    rng = random.Random(seed)
+    hits = []
+    for chip in chips:
+        if not chip.is_playable or (skip_rate and rng.random() < skip_rate):
+            continue
+        hits.append((chip.time + offset_ms + (rng.gauss(0.0, jitter_ms) if jitter_ms else 0.0), chip.channel))
+    hits.sort()
+    return hits
+
+
+def simulate(dtx, hits, frame_ms=FRAME_MS):
+    """
+    Plays a chart headless against an input script, as fast as possible.
+
+    A virtual clock advances one frame at a time; each frame judges the hits
+    due by then at their own timestamps and runs update_notes, exactly as the
+    live loop does with MIDI input.
+
+    Args:
+        dtx (Dtx): A parsed chart.
+        hits (list): Sorted (time_ms, channel) pad hits.
+        frame_ms (float): Virtual frame length.
+
+    Returns:
+        Game: The finished game, for its judgement_counts and judgement state.
+    """
+    game = Game(dtx, headless=True)
+    game.auto_mode = False
+    state = game.game_state
+    i = 0
+    frame = 0
+    end_ms = max(game.song_duration_ms, hits[-1][0] if hits else 0.0)
+    now = 0.0
+    while now <= end_ms:
+        now = frame * frame_ms
+        state["current_time_ms"] = now
+        while i < len(hits) and hits[i][0] <= now:
+            game.trigger_manual_note(hits[i][1], hits[i][0], play_sound=False)
+            i += 1
+        game.update_notes()
+        state["hit_animations"].clear()
+        frame += 1
+    return game
+
+
+def _init_worker():
+    """Keeps per-hit judgement logging out of the batch output."""
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def run_job(job):
+    """
+    Simulates one (chart path, input script path or None, options) job.
+
+    Without a script, a synthetic one is generated from options "offset_ms",
+    "jitter_ms", "skip_rate" and "seed".
+
+    Returns:
+        dict: "chart", "script", "notes", "counts", "elapsed_s" and, if the
+        job failed, "error".
+    """
+    chart_path, script_path, options = job
+    start = time.perf_counter()
+    result = {"chart": chart_path, "script": script_path}
+    try:
+        dtx = load_chart(chart_path)
+        if script_path:
+            hits = load_input_script(script_path)
+        else:
+            hits = synthetic_script(
+                dtx.build_chips(Game.PLAYABLE_CHANNELS),
+                options.get("offset_ms", 0.0),
+                options.get("jitter_ms", 0.0),
+                options.get("skip_rate", 0.0),
+                options.get("seed", 0),
+            )
+        game = simulate(dtx, hits)
+        result["notes"] = sum(1 for chip in game.notes_to_play if chip.is_playable)
+        result["counts"] = game.judgement_counts
+    except Exception as e:
+        result["error"] = str(e)
+    result["elapsed_s"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(jobs, workers=None):
+    """
+    Runs jobs (see run_job) across a process pool.
+
+    Returns:
+        list: One result dict per job, in order.
+    """
+    if workers == 1 or len(jobs) <= 1:
+        _init_worker()
+        return [run_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(run_job, jobs, chunksize=max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))))
+
+
+def find_charts(path):
+    """Returns the chart at path, or every chart under it if it is a directory."""
+    if not os.path.isdir(path):
+        return [path]
+    charts = []
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            if name.lower().endswith(CHART_EXTENSIONS):
+                charts.append(os.path.join(dirpath, name))
+    return sorted(charts)
+
+
+def main():
+    """Simulates charts against input scripts from the command line."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)-7s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print(
+            "Usage: python simulate.py <chart.dtx|library_dir> [--script=hits.json] [--workers=N] "
+            "[--offset=ms] [--jitter=ms] [--skip=F] [--seed=N] [--out=results.json]"
+        )
+        sys.exit(1)
+
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    synthetic = {
+        "offset_ms": float(options.get("offset", 0)),
+        "jitter_ms": float(options.get("jitter", 0)),
+        "skip_rate": float(options.get("skip", 0)),
+        "seed": int(options.get("seed", 0)),
+    }
+    jobs = [(chart, options.get("script"), synthetic) for chart in find_charts(args[0])]
+    workers = int(options["workers"]) if "workers" in options else None
+
+    start = time.perf_counter()
+    results = run_batch(jobs, workers)
+    elapsed = time.perf_counter() - start
+    logging.getLogger().setLevel(logging.INFO)
+
+    failed = 0
+    for result in results:
+        name = os.path.basename(result["chart"])
+        if "error" in result:
+            failed += 1
+            print(f"{name:<40} ERROR {result['error']}")
+            continue
+        counts = " ".join(f"{k.title()} {v}" for k, v in result["counts"].items())
+        print(f"{name:<40} {result['notes']:>6} notes  {counts}  {result['elapsed_s'] * 1000:.0f}ms")
+    logging.info(f"Simulated {len(results)} chart(s) in {elapsed:.2f}s, {failed} failed.")
+
+    if "out" in options:
+        with open(options["out"], "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
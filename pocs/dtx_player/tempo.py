@@ -0,0 +1,121 @@
+from bisect import bisect_right
+
+# DTXMania chip positions: every measure is 384 ticks regardless of its length.
+TICKS_PER_MEASURE = 384
+
+# ConfigIni.nChipPlayTimeComputeMode values (see notes/02).
+ROUND_TRUNCATE = 0  # Legacy: truncate to whole milliseconds
+ROUND_NEAREST = 1  # High precision: Math.Round (ties to even, like round())
+
+
+def position_to_tick(bar, pos, total_pos):
+    """Converts an object's (bar, index, count) placement to a tick position."""
+    return bar * TICKS_PER_MEASURE + TICKS_PER_MEASURE * pos / total_pos
+
+
+class TempoMap:
+    """
+    Converts between tick positions and playback time for one chart.
+
+    The chart is split into segments of constant milliseconds-per-tick,
+    starting at tick 0, at every BPM change (channels 03/08) and at every
+    measure whose length (channel 02) differs from the default. A tick spans
+    625 * bar_length / bpm ms, the same formula as DTXMania's
+    tComputeChipPlayTimeMs. Lookups binary-search the segment starts.
+
+    Bar lengths apply to their own measure only, matching Dtx.parse.
+
+    With a rounding mode, each segment start is rounded and the next segment
+    accumulates from the rounded value, as DTXMania does when it re-anchors
+    on the stored whole-millisecond time of every BPM and bar length chip.
+    Times within a segment are rounded once more from that anchor.
+    """
+
+    def __init__(self, base_bpm, bpm_events=(), bar_length_changes=None, rounding=None):
+        """
+        Args:
+            base_bpm (float): BPM in effect from tick 0.
+            bpm_events (iterable): (tick, bpm) pairs in chronological order. If
+                several share a tick, the last one wins.
+            bar_length_changes (dict): Maps measure number to length multiplier.
+            rounding (int): None for exact float milliseconds, or ROUND_TRUNCATE
+                / ROUND_NEAREST to return whole milliseconds like DTXMania,
+                rounding every segment start as well.
+        """
+        self.rounding = rounding
+        bar_lengths = dict(bar_length_changes or {})
+
+        bpm_at_tick = {}
+        for tick, bpm in bpm_events:
+            bpm_at_tick[tick] = bpm
+
+        boundaries = {0.0, *bpm_at_tick}
+        for measure in bar_lengths:
+            boundaries.add(measure * TICKS_PER_MEASURE)
+            boundaries.add((measure + 1) * TICKS_PER_MEASURE)
+
+        # Parallel lists, one entry per segment.
+        self._start_ticks = []
+        self._start_ms = []
+        self._ms_per_tick = []
+        self._bpms = []
+
+        bpm = base_bpm
+        ms = 0.0
+        for tick in sorted(t for t in boundaries if t >= 0):
+            if self._start_ticks:
+                ms = self._round(ms + (tick - self._start_ticks[-1]) * self._ms_per_tick[-1])
+            bpm = bpm_at_tick.get(tick, bpm)
+            bar_length = bar_lengths.get(int(tick // TICKS_PER_MEASURE), 1.0)
+            self._start_ticks.append(tick)
+            self._start_ms.append(ms)
+            self._ms_per_tick.append(625.0 * bar_length / bpm if bpm > 0 else 0.0)
+            self._bpms.append(bpm)
+
+    def __len__(self):
+        return len(self._start_ticks)
+
+    def _round(self, ms):
+        if self.rounding is None:
+            return ms
+        if self.rounding == ROUND_TRUNCATE:
+            return int(ms)
+        return int(round(ms))
+
+    def _segment_for_tick(self, tick):
+        return max(0, bisect_right(self._start_ticks, tick) - 1)
+
+    def _exact_ms(self, tick):
+        i = self._segment_for_tick(tick)
+        return self._start_ms[i] + (tick - self._start_ticks[i]) * self._ms_per_tick[i]
+
+    def tick_to_ms(self, tick):
+        """Returns the playback time (ms) of a tick position."""
+        return self._round(self._exact_ms(tick))
+
+    def ms_to_tick(self, ms):
+        """
+        Returns the (fractional) tick position played at the given time.
+        Zero-length segments (BPM 0) resolve to their end.
+        """
+        i = max(0, bisect_right(self._start_ms, ms) - 1)
+        rate = self._ms_per_tick[i]
+        if rate <= 0:
+            return self._start_ticks[i]
+        return self._start_ticks[i] + (ms - self._start_ms[i]) / rate
+
+    def measure_to_ms(self, measure):
+        """Returns the playback time (ms) of the start of a (fractional) measure."""
+        return self._round(self._exact_ms(measure * TICKS_PER_MEASURE))
+
+    def ms_to_measure(self, ms):
+        """Returns the fractional measure number played at the given time."""
+        return self.ms_to_tick(ms) / TICKS_PER_MEASURE
+
+    def bpm_at_tick(self, tick):
+        """Returns the BPM in effect at a tick position."""
+        return self._bpms[self._segment_for_tick(tick)]
+
+    def bpm_at_ms(self, ms):
+        """Returns the BPM in effect at a playback time."""
+        return self.bpm_at_tick(self.ms_to_tick(ms))
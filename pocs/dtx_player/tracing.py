@@ -0,0 +1,136 @@
+import os
+import json
+import logging
+from array import array
+from time import perf_counter_ns
+
+# Span kinds recorded by the game loop.
+SPAN_FRAME = 0  # One loop iteration, frame cap sleep included
+SPAN_INPUT = 1  # Events, MIDI and replay input
+SPAN_UPDATE = 2  # update_notes
+SPAN_DRAW = 3  # draw_frame
+SPAN_PLAY = 4  # play_note for auto chips; only without MixerStream (no NumPy)
+SPAN_MIX = 5  # MixerStream.pump, which renders and queues mixer blocks
+MARK_LATENESS = 6  # Instant: play_note trigger time minus scheduled chip time (ms).
+# MixerStream places chips on their exact sample, so it records none.
+SPAN_NAMES = ("frame", "input", "update_notes", "draw_frame", "play_note", "mixer_pump", "trigger_lateness")
+
+# Events kept; older ones are overwritten. At 240 fps with a few spans per
+# frame this is around a minute of history.
+TRACE_CAPACITY = 1 << 16
+
+
+class Tracer:
+    """
+    Fixed-size ring buffer of timed spans and instant values.
+
+    Storage is preallocated parallel arrays, so recording an event is a few
+    stores and no allocation. Only the main thread may record. A game
+    without tracing holds None instead of a Tracer and guards each call
+    site with a single truth test.
+
+    Typical use:
+        start = tracer.begin()
+        ...
+        tracer.end(SPAN_DRAW, start)
+    """
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.capacity = capacity
+        self._kinds = bytearray(capacity)
+        self._starts = array("q", bytes(8 * capacity))
+        self._durations = array("q", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._count = 0
+        self.origin_ns = perf_counter_ns()
+
+    begin = staticmethod(perf_counter_ns)
+
+    def end(self, kind, start_ns):
+        """Records a span of kind from start_ns (as returned by begin) to now."""
+        i = self._count % self.capacity
+        self._kinds[i] = kind
+        self._starts[i] = start_ns
+        self._durations[i] = perf_counter_ns() - start_ns
+        self._count += 1
+
+    def mark(self, kind, value):
+        """Records an instant value, such as a trigger lateness in ms."""
+        i = self._count % self.capacity
+        self._kinds[i] = kind
+        self._starts[i] = perf_counter_ns()
+        self._durations[i] = 0
+        self._values[i] = value
+        self._count += 1
+
+    @property
+    def size(self):
+        """Events currently buffered."""
+        return min(self._count, self.capacity)
+
+    def events(self):
+        """Yields (kind, start_ns, duration_ns, value) for the buffered events, oldest first."""
+        first = max(0, self._count - self.capacity)
+        for n in range(first, self._count):
+            i = n % self.capacity
+            yield self._kinds[i], self._starts[i], self._durations[i], self._values[i]
+
+    def stats(self):
+        """
+        Percentiles per span kind.
+
+        Returns:
+            dict: Span name -> {"count", "p50", "p99", "max"} in ms; spans are
+            measured by duration, marks by value.
+        """
+        samples = {}
+        for kind, _, duration_ns, value in self.events():
+            samples.setdefault(kind, []).append(value if kind == MARK_LATENESS else duration_ns / 1e6)
+        result = {}
+        for kind, values in sorted(samples.items()):
+            values.sort()
+            result[SPAN_NAMES[kind]] = {
+                "count": len(values),
+                "p50": _percentile(values, 50),
+                "p99": _percentile(values, 99),
+                "max": values[-1],
+            }
+        return result
+
+    def log_summary(self):
+        """Logs p50/p99/max for every span kind recorded."""
+        for name, s in self.stats().items():
+            logging.info(
+                f"Trace {name:<16} n={s['count']:<6} p50 {s['p50']:7.3f}ms  p99 {s['p99']:7.3f}ms  max {s['max']:7.3f}ms"
+            )
+
+    def export_chrome_trace(self, path):
+        """
+        Writes the buffered events as Chrome trace JSON, viewable in
+        chrome://tracing or Perfetto. Spans become complete ("X") events and
+        marks become counter ("C") events.
+        """
+        trace_events = []
+        for kind, start_ns, duration_ns, value in self.events():
+            event = {
+                "name": SPAN_NAMES[kind],
+                "pid": os.getpid(),
+                "tid": 1,
+                "ts": (start_ns - self.origin_ns) / 1000,
+            }
+            if kind == MARK_LATENESS:
+                event.update(ph="C", args={"ms": value})
+            else:
+                event.update(ph="X", dur=duration_ns / 1000)
+            trace_events.append(event)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp_path, path)
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[int(rank)]
@@ -0,0 +1,182 @@
+import json
+import logging
+from collections import deque
+import pygame
+
+# Choke groups: playing any "chokers" channel fades out every voice still
+# sounding on the group's "choked" channels. Overridable with a JSON file of
+# the same shape (see load_choke_groups).
+DEFAULT_CHOKE_GROUPS = {
+    "hihat": {"chokers": ["11", "1B"], "choked": ["18"]},  # Closed/pedal HH choke open HH
+}
+
+# Voice priority per channel when every voice is busy: a new chip may only
+# steal from a voice of equal or lower priority. Unlisted channels use 0.
+DEFAULT_PRIORITIES = {
+    "01": 4,  # BGM layers
+    "12": 3, "13": 3, "1C": 3,  # Snare, kick, left bass drum
+    "11": 2, "18": 2, "1B": 2, "14": 2, "15": 2, "17": 2,  # Hi-hats, pedal, toms
+    "16": 1, "19": 1, "1A": 1,  # Cymbals and ride: long tails, stolen first
+}
+
+MAX_PRIORITY = max(DEFAULT_PRIORITIES.values())
+
+
+def load_choke_groups(path):
+    """
+    Reads choke groups from a JSON file shaped like DEFAULT_CHOKE_GROUPS.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If it is not valid JSON or a group lacks chokers/choked.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        groups = json.load(f)
+    for name, group in groups.items():
+        if not isinstance(group, dict) or "chokers" not in group or "choked" not in group:
+            raise ValueError(f"Choke group '{name}' needs 'chokers' and 'choked' lists.")
+    return groups
+
+
+def choke_map_from_groups(groups):
+    """Flattens choke groups into {choker channel: [choked channels]}."""
+    choke_map = {}
+    for group in groups.values():
+        for choker in group["chokers"]:
+            choked = choke_map.setdefault(choker, [])
+            choked.extend(channel for channel in group["choked"] if channel not in choked)
+    return choke_map
+
+
+class VoicePool:
+    """
+    A fixed set of pygame mixer channels allocated to chips in O(1).
+
+    Every voice is a pygame.mixer.Channel the pool plays explicitly by
+    index. The channels are not reserved with set_reserved (only channel 0,
+    for MixerStream, is). Nothing competes for them because the player
+    never calls Sound.play(), which is what picks free channels
+    automatically. Voices are tracked in ring buffers:
+
+    - per lane (DTX channel), holding at most polyphony_limit voices; a new
+      chip on a full lane fades out the lane's oldest voice;
+    - per choke group, holding the voices of its choked channels;
+    - per priority level, in allocation order, used for stealing when no
+      voice is free: the oldest voice of the lowest priority level not above
+      the new chip's priority is cut.
+
+    Ring entries are (voice index, generation) pairs; reusing a voice bumps
+    its generation, so stale entries are skipped lazily instead of searched
+    for and removed.
+    """
+
+    def __init__(self, first_channel, count, polyphony_limit, choke_groups, priorities=None, fade_out_ms=100):
+        """
+        Args:
+            first_channel (int): Index of the first pygame mixer channel to use.
+            count (int): Number of channels (voices) to reserve.
+            polyphony_limit (int): Voices per lane before the oldest is faded.
+            choke_groups (dict): See DEFAULT_CHOKE_GROUPS.
+            priorities (dict): Channel -> priority; defaults to DEFAULT_PRIORITIES.
+            fade_out_ms (int): Fade used for polyphony and choke releases.
+        """
+        if pygame.mixer.get_num_channels() < first_channel + count:
+            pygame.mixer.set_num_channels(first_channel + count)
+        self.channels = [pygame.mixer.Channel(first_channel + i) for i in range(count)]
+        self.polyphony_limit = polyphony_limit
+        self.priorities = DEFAULT_PRIORITIES if priorities is None else priorities
+        self.fade_out_ms = fade_out_ms
+
+        self._generation = [0] * count
+        self._free = deque(range(count))
+        self._by_lane = {}
+        self._by_priority = [deque(maxlen=count) for _ in range(MAX_PRIORITY + 1)]
+
+        # Channel -> names of the groups it chokes / is choked in.
+        self._choke_groups = {name: deque(maxlen=count) for name in choke_groups}
+        self._chokes = {}
+        self._choked_in = {}
+        for name, group in choke_groups.items():
+            for channel in group["chokers"]:
+                self._chokes.setdefault(channel, []).append(name)
+            for channel in group["choked"]:
+                self._choked_in.setdefault(channel, []).append(name)
+
+        self.steals = 0
+        self.drops = 0
+
+    def _is_live(self, entry):
+        index, generation = entry
+        return self._generation[index] == generation and self.channels[index].get_busy()
+
+    def _reclaim(self):
+        """Refills the free list with voices whose sound has ended."""
+        self._free.extend(i for i, channel in enumerate(self.channels) if not channel.get_busy())
+
+    def _steal(self, priority):
+        for level in range(min(priority, MAX_PRIORITY) + 1):
+            ring = self._by_priority[level]
+            while ring:
+                index, generation = ring.popleft()
+                if self._generation[index] == generation:
+                    self.channels[index].stop()
+                    self.steals += 1
+                    return index
+        return None
+
+    def _allocate(self, priority):
+        if not self._free:
+            self._reclaim()
+        if self._free:
+            return self._free.popleft()
+        return self._steal(priority)
+
+    def play(self, lane, sound, volume, fade_in_ms=0):
+        """
+        Plays a sound for a chip on the given lane (DTX channel).
+
+        Returns:
+            pygame.mixer.Channel: The voice used, or None if every voice was
+            busy with higher-priority sounds.
+        """
+        for group in self._chokes.get(lane, ()):
+            ring = self._choke_groups[group]
+            while ring:
+                entry = ring.popleft()
+                if self._is_live(entry):
+                    self.channels[entry[0]].fadeout(self.fade_out_ms)
+
+        lane_ring = self._by_lane.get(lane)
+        if lane_ring is None:
+            lane_ring = self._by_lane[lane] = deque(maxlen=self.polyphony_limit)
+        if len(lane_ring) == self.polyphony_limit and self._is_live(lane_ring[0]):
+            self.channels[lane_ring[0][0]].fadeout(self.fade_out_ms)
+
+        priority = self.priorities.get(lane, 0)
+        index = self._allocate(priority)
+        if index is None:
+            self.drops += 1
+            logging.debug(f"Voice pool: dropped chip on {lane}; all voices busy with higher priority.")
+            return None
+
+        self._generation[index] += 1
+        entry = (index, self._generation[index])
+        channel = self.channels[index]
+        channel.set_volume(volume)
+        channel.play(sound, fade_ms=fade_in_ms)
+
+        lane_ring.append(entry)
+        self._by_priority[min(priority, MAX_PRIORITY)].append(entry)
+        for group in self._choked_in.get(lane, ()):
+            self._choke_groups[group].append(entry)
+        return channel
+
+    def stop_all(self):
+        for channel in self.channels:
+            channel.stop()
+        self._free = deque(range(len(self.channels)))
+        self._by_lane.clear()
+        for ring in self._by_priority:
+            ring.clear()
+        for ring in self._choke_groups.values():
+            ring.clear()